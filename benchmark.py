@@ -0,0 +1,344 @@
+"""
+Benchmarks the scrapers against a local stand-in server.
+
+The server replays the recorded pages in fixtures/ with configurable
+latency, error rate and pagination depth, so runs are repeatable and never
+touch the real sites. Each benchmark runs in a fresh process so its peak RSS
+is its own, and reports pages/s, parse ms per page, p50/p99 request latency
+and peak RSS.
+
+Run with: python benchmark.py [--latency 0.05] [--error-rate 0.02] [--pages 20]
+          [--requests 100] [--json results.json] [--compare baseline.json]
+"""
+import argparse
+import concurrent.futures
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+CATEGORY_PATH = '/ARDC.in/category/times-of-kudla-news/'
+RECORDED_SITE = 'https://www.timesofkudla.com'
+PAGE_FIXTURES = ('plain_page.html', 'article_page.html', 'table_page.html')
+
+PAGINATION_RE = re.compile(r'<nav class="navigation pagination".*?</nav>', re.S)
+ARTICLE_HREF_RE = re.compile(r'href="(/ARDC\.in/[a-z0-9-]+)/"')
+PAGE_PATH_RE = re.compile(r'/page/(\d+)/$')
+
+# Metrics compared by --compare: name -> True if higher is better
+TRACKED_METRICS = {'pages_per_s': True, 'parse_ms': False, 'p50_ms': False, 'p99_ms': False}
+
+
+class StandInServer:
+    """Local HTTP server replaying the recorded fixtures"""
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, latency=0.05, jitter=0.02, error_rate=0.0,
+                 pages=20, seed=0):
+        self.fixtures = {}
+        for name in os.listdir(fixtures_dir):
+            with open(os.path.join(fixtures_dir, name), 'rb') as f:
+                self.fixtures[name] = f.read()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.pages = pages
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.server = None
+
+    def category_page(self, number):
+        """The recorded category listing as page number of self.pages"""
+        markup = self.fixtures['category_page.html'].decode('utf-8')
+        markup = markup.replace(RECORDED_SITE, self.base_url)
+        # Give every page its own article URLs
+        markup = ARTICLE_HREF_RE.sub(lambda m: f'href="{m.group(1)}-p{number}/"', markup)
+
+        links = [f'<span aria-current="page" class="page-numbers current">{number}</span>']
+        if number < self.pages:
+            next_url = f'{self.base_url}{CATEGORY_PATH}page/{number + 1}/'
+            links.append(f'<a class="page-numbers" href="{next_url}">{number + 1}</a>')
+            links.append(f'<a class="next page-numbers" href="{next_url}">Next &raquo;</a>')
+        nav = ('<nav class="navigation pagination" aria-label="Posts"><div class="nav-links">'
+               + ''.join(links) + '</div></nav>')
+        return PAGINATION_RE.sub(lambda m: nav, markup).encode('utf-8')
+
+    def respond(self, path):
+        """(status, body) for a request path"""
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            failed = self.random.random() < self.error_rate
+        time.sleep(delay)
+        if failed:
+            return 500, b'Internal Server Error'
+
+        path = path.split('?', 1)[0]
+        if path.startswith('/fixtures/') and path[len('/fixtures/'):] in self.fixtures:
+            return 200, self.fixtures[path[len('/fixtures/'):]]
+        if path.startswith(CATEGORY_PATH):
+            match = PAGE_PATH_RE.search(path)
+            number = int(match.group(1)) if match else 1
+            if number <= self.pages and (match or path == CATEGORY_PATH):
+                return 200, self.category_page(number)
+        return 404, b'Not Found'
+
+    def start(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; without this, keep-alive
+            # clients wait out delayed ACKs
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                status, body = stand_in.respond(self.path)
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def summarize(pages, elapsed, latencies, parse_times, errors):
+    """Common metrics of one benchmark"""
+    return {
+        'pages': pages,
+        'pages_per_s': pages / elapsed if elapsed else 0.0,
+        'parse_ms': 1000 * sum(parse_times) / len(parse_times) if parse_times else 0.0,
+        'p50_ms': 1000 * percentile(latencies, 0.50),
+        'p99_ms': 1000 * percentile(latencies, 0.99),
+        'errors': errors,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def bench_scrape_website(base_url, requests_count):
+    """htmlfile_scrap.scrape_website over the recorded pages"""
+    import htmlfile_scrap
+
+    urls = [f'{base_url}/fixtures/{PAGE_FIXTURES[i % len(PAGE_FIXTURES)]}'
+            for i in range(requests_count)]
+
+    # Time parsing on its own so network latency does not hide regressions
+    build_record = htmlfile_scrap.build_record
+    parse_times = []
+
+    def timed_build_record(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return build_record(*args, **kwargs)
+        finally:
+            parse_times.append(time.perf_counter() - started)
+
+    htmlfile_scrap.build_record = timed_build_record
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for url in urls:
+        request_started = time.perf_counter()
+        record = htmlfile_scrap.scrape_website(url)
+        latencies.append(time.perf_counter() - request_started)
+        errors += record.title == 'Error'
+    elapsed = time.perf_counter() - started
+    return summarize(len(urls), elapsed, latencies, parse_times, errors)
+
+
+def bench_kudla_pages(base_url, pages, profile_file=None):
+    """SimpleKudlaScraper.scrape_all_pages over a paginated category"""
+    from http_gateway import SimpleKudlaScraper
+    from politeness import HostScheduler
+    from site_profiles import SiteProfiles
+
+    scraper = SimpleKudlaScraper()
+    scraper.base_url = base_url + CATEGORY_PATH
+    scraper.debug_file = os.devnull
+    if profile_file:
+        scraper.profiles = SiteProfiles(profile_file)
+    # Measure the scraper, not the politeness delays
+    scraper.scheduler = HostScheduler(min_rate=1000, max_rate=1e6, initial_rate=1e6, burst=1e6,
+                                      backoff_base=0.01, max_backoff=0.05)
+
+    fetch_raw, extract_articles = scraper.fetch_raw, scraper.extract_articles
+    latencies, parse_times, fetched = [], [], []
+
+    def timed_fetch_raw(url, max_retries=3):
+        started = time.perf_counter()
+        html = fetch_raw(url, max_retries)
+        latencies.append(time.perf_counter() - started)
+        fetched.append(html is not None)
+        return html
+
+    def timed_extract_articles(soup, page_url=None):
+        started = time.perf_counter()
+        try:
+            return extract_articles(soup, page_url)
+        finally:
+            parse_times.append(time.perf_counter() - started)
+
+    scraper.fetch_raw = timed_fetch_raw
+    scraper.extract_articles = timed_extract_articles
+    started = time.perf_counter()
+    scraper.scrape_all_pages()
+    elapsed = time.perf_counter() - started
+    result = summarize(sum(fetched), elapsed, latencies, parse_times, fetched.count(False))
+    result['articles'] = len(scraper.data)
+    return result
+
+
+def bench_kudla_profiled(base_url, pages):
+    """kudla_pages with the site profile a first run learned"""
+    bench_kudla_pages(base_url, pages, profile_file='site_profiles.json')
+    return bench_kudla_pages(base_url, pages, profile_file='site_profiles.json')
+
+
+def bench_read_table(base_url, requests_count):
+    """main.read_table on the recorded table page"""
+    from requests.exceptions import HTTPError
+    from main import read_table
+
+    url = f'{base_url}/fixtures/table_page.html'
+    with open(os.path.join(FIXTURES_DIR, 'table_page.html'), encoding='utf-8') as f:
+        markup = f.read()
+
+    latencies, parse_times, errors = [], [], 0
+    started = time.perf_counter()
+    for _ in range(requests_count):
+        request_started = time.perf_counter()
+        try:
+            read_table(url)
+        except HTTPError:
+            errors += 1
+        latencies.append(time.perf_counter() - request_started)
+    elapsed = time.perf_counter() - started
+
+    # Parse cost without the network
+    for _ in range(requests_count):
+        parse_started = time.perf_counter()
+        read_table(io.StringIO(markup))
+        parse_times.append(time.perf_counter() - parse_started)
+    return summarize(requests_count - errors, elapsed, latencies, parse_times, errors)
+
+
+BENCHMARKS = {
+    'scrape_website': (bench_scrape_website, 'requests'),
+    'kudla_pages': (bench_kudla_pages, 'pages'),
+    'kudla_profiled': (bench_kudla_profiled, 'pages'),
+    'read_table': (bench_read_table, 'requests'),
+}
+
+
+def run_isolated(name, base_url, size):
+    """Run one benchmark in a fresh process (its own working directory, so
+    debug files stay out of the tree) and return its metrics"""
+    func = BENCHMARKS[name][0]
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as workdir:
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=context,
+                                                    initializer=_enter_workdir,
+                                                    initargs=(workdir,)) as pool:
+            return pool.submit(func, base_url, size).result()
+
+
+def _enter_workdir(workdir):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+
+
+def print_report(results):
+    print(f"{'benchmark':<16}{'pages':>7}{'pages/s':>10}{'parse ms':>10}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'peak RSS MB':>13}")
+    for name, metrics in results.items():
+        print(f"{name:<16}{metrics['pages']:>7}{metrics['pages_per_s']:>10.1f}"
+              f"{metrics['parse_ms']:>10.2f}{metrics['p50_ms']:>9.1f}{metrics['p99_ms']:>9.1f}"
+              f"{metrics['errors']:>8}{metrics['peak_rss_mb']:>13.1f}")
+
+
+def compare(results, baseline, tolerance):
+    """Print changes against a baseline run; return False on any regression
+    larger than tolerance (a fraction)"""
+    ok = True
+    for name, metrics in results.items():
+        if name not in baseline:
+            continue
+        for metric, higher_is_better in TRACKED_METRICS.items():
+            old, new = baseline[name].get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change < -tolerance if higher_is_better else change > tolerance
+            if regressed:
+                ok = False
+            print(f"{'REGRESSION' if regressed else 'ok':<11}{name} {metric}: "
+                  f"{old:.2f} -> {new:.2f} ({change:+.1%})")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against recorded pages")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.02, help="random extra latency, seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument('--pages', type=int, default=20, help="pagination depth of the category")
+    parser.add_argument('--requests', type=int, default=100,
+                        help="requests for the single-page benchmarks")
+    parser.add_argument('--only', choices=sorted(BENCHMARKS), action='append',
+                        help="run only this benchmark (repeatable)")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--compare', help="baseline results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="allowed regression before --compare fails (fraction)")
+    args = parser.parse_args(argv)
+
+    server = StandInServer(latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, pages=args.pages)
+    base_url = server.start()
+    sizes = {'requests': args.requests, 'pages': args.pages}
+    results = {}
+    try:
+        for name in args.only or BENCHMARKS:
+            results[name] = run_isolated(name, base_url, sizes[BENCHMARKS[name][1]])
+    finally:
+        server.stop()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            if not compare(results, json.load(f), args.tolerance):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+Boilerplate-aware main content extraction.
+
+Scores the page readability-style in one bottom-up pass: every paragraph
+with enough text scores by its length and commas, passing the score to its
+parent in full and to its grandparent in half. Class and id names add or
+subtract weight, and the candidate's score is scaled by 1 - link density.
+Text, link text and comma counts come from running totals, so no element's
+text is computed twice. Navigation, sidebars, comment threads and footers
+are pruned without being walked. The pass can stop as soon as one block
+clearly dominates, since what follows the main text is usually boilerplate.
+
+Both the BeautifulSoup and the lexbor tree are supported; extract_markup in
+extractor picks this extractor with content='density'.
+"""
+import re
+
+# Never content: subtrees skipped without walking them
+PRUNED_TAGS = frozenset([
+    'nav', 'aside', 'footer', 'form', 'script', 'style', 'noscript', 'template', 'iframe',
+    'svg', 'button', 'select', 'rt', 'rp',
+])
+UNLIKELY_RE = re.compile(
+    r'-ad-|banner|breadcrumb|combx|comment|community|disqus|extra|footer|gdpr|header|legends|'
+    r'menu|related|remark|replies|rss|shoutbox|sidebar|skyscraper|social|sponsor|supplemental|'
+    r'ad-break|agegate|pagination|pager|popup|share|widget', re.IGNORECASE)
+MAYBE_RE = re.compile(r'and|article|body|column|content|main|shadow', re.IGNORECASE)
+# Only these containers are pruned by class; tables, links and inline
+# elements are not (a 'plainrowheaders' table is still content)
+UNLIKELY_TAGS = frozenset(['div', 'section', 'header', 'ul', 'ol', 'li', 'p', 'span'])
+
+POSITIVE_RE = re.compile(r'article|body|content|entry|hentry|main|page|post|text|blog|story',
+                         re.IGNORECASE)
+NEGATIVE_RE = re.compile(r'hidden|banner|combx|comment|com-|contact|foot|masthead|media|meta|'
+                         r'outbrain|promo|related|scroll|shoutbox|sidebar|sponsor|shopping|tags|'
+                         r'tool|widget|nav', re.IGNORECASE)
+
+# Elements whose own text is scored as a paragraph
+PARAGRAPH_TAGS = frozenset(['p', 'pre', 'td', 'blockquote'])
+# Starting score of a candidate by tag
+TAG_SCORES = {
+    'div': 5, 'article': 5, 'main': 5, 'section': 3, 'pre': 3, 'td': 3, 'blockquote': 3,
+    'address': -3, 'ol': -3, 'ul': -3, 'dl': -3, 'dd': -3, 'dt': -3, 'li': -3, 'form': -3,
+    'h1': -5, 'h2': -5, 'h3': -5, 'h4': -5, 'h5': -5, 'h6': -5, 'th': -5,
+}
+MIN_PARAGRAPH_LENGTH = 25
+
+# Early stop: a closed block with at least this much text that outscores
+# every other candidate seen so far by this factor
+DOMINANT_LENGTH = 2000
+DOMINANCE = 3.0
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def is_pruned(tag, names):
+    """Whether an element (tag name, 'class id' string) is boilerplate"""
+    if tag in PRUNED_TAGS:
+        return True
+    if tag not in UNLIKELY_TAGS or not names:
+        return False
+    return UNLIKELY_RE.search(names) is not None and MAYBE_RE.search(names) is None
+
+
+def class_weight(names):
+    """Readability's class/id weight"""
+    if not names:
+        return 0
+    weight = 0
+    if NEGATIVE_RE.search(names):
+        weight -= 25
+    if POSITIVE_RE.search(names):
+        weight += 25
+    return weight
+
+
+class DensityScorer:
+    """
+    Walk handler scoring candidate blocks; walk_soup/walk_lexbor call
+    start/text/end in document order and stop once `stopped` is set.
+    """
+
+    def __init__(self, early_stop=True):
+        self.early_stop = early_stop
+        # Open elements: [node, tag, names, text/link text/commas at start, score]
+        self.stack = []
+        self.text_length = 0
+        self.link_length = 0
+        self.commas = 0
+        self.link_depth = 0
+        self.best = None        # (score, node, text length)
+        self.runner_up = 0.0
+        self.stopped = False
+
+    def start(self, node, tag, names):
+        """Called on entering an element; returns False to skip its subtree"""
+        if is_pruned(tag, names):
+            return False
+        if tag == 'a':
+            self.link_depth += 1
+        self.stack.append([node, tag, names, self.text_length, self.link_length, self.commas, 0.0])
+        return True
+
+    def text(self, value):
+        length = len(value.strip())
+        if not length:
+            return
+        self.text_length += length
+        self.commas += value.count(',') + value.count('،') + value.count('，')
+        if self.link_depth:
+            self.link_length += length
+
+    def end(self):
+        node, tag, names, text_start, link_start, comma_start, score = self.stack.pop()
+        if tag == 'a':
+            self.link_depth -= 1
+        length = self.text_length - text_start
+
+        if tag in PARAGRAPH_TAGS and length >= MIN_PARAGRAPH_LENGTH:
+            paragraph = 1 + (self.commas - comma_start) + min(length / 100, 3)
+            if self.stack:
+                self.stack[-1][6] += paragraph
+                if len(self.stack) > 1:
+                    self.stack[-2][6] += paragraph / 2
+
+        if score <= 0 or not length:
+            return
+        link_density = (self.link_length - link_start) / length
+        final = (score + TAG_SCORES.get(tag, 0) + class_weight(names)) * (1 - link_density)
+        if self.best is None or final > self.best[0]:
+            if self.best is not None:
+                self.runner_up = max(self.runner_up, self.best[0])
+            self.best = (final, node, length)
+        else:
+            self.runner_up = max(self.runner_up, final)
+
+        if (self.early_stop and self.best[1] is node and length >= DOMINANT_LENGTH
+                and final >= DOMINANCE * max(self.runner_up, 1)):
+            self.stopped = True
+
+
+class TextCollector:
+    """Walk handler joining the visible, non-boilerplate text of a block"""
+
+    def __init__(self):
+        self.parts = []
+        self.stopped = False
+
+    def start(self, node, tag, names):
+        return not is_pruned(tag, names)
+
+    def text(self, value):
+        value = value.strip()
+        if value:
+            self.parts.append(value)
+
+    def end(self):
+        pass
+
+    def result(self):
+        return _WHITESPACE_RE.sub(' ', ' '.join(self.parts)).strip()
+
+
+def _soup_names(element):
+    classes = element.get('class')
+    if isinstance(classes, list):
+        classes = ' '.join(classes)
+    element_id = element.get('id')
+    if element_id:
+        return f'{classes} {element_id}' if classes else element_id
+    return classes or ''
+
+
+def walk_soup(root, handler):
+    """Feed a BeautifulSoup subtree to handler in document order"""
+    from bs4.element import CData, NavigableString, Tag
+
+    text_types = (NavigableString, CData)
+    stop_at = root._last_descendant()
+    ends = []            # Last descendant of every open element
+    element = root
+    while element is not None and not handler.stopped:
+        last = element
+        if isinstance(element, Tag):
+            if handler.start(element, element.name, _soup_names(element)):
+                ends.append(element._last_descendant())
+            else:
+                last = element._last_descendant()  # Skip the subtree
+        elif type(element) in text_types:
+            handler.text(element)
+
+        # Close every element whose subtree ends here
+        while ends and ends[-1] is last:
+            ends.pop()
+            handler.end()
+        if last is stop_at:
+            break
+        element = last.next_element
+
+
+def walk_lexbor(root, handler):
+    """Feed a lexbor (selectolax) subtree to handler in document order"""
+    root_id = root.mem_id  # LexborNode.__eq__ serializes both nodes; compare ids
+    node = root
+    while node is not None and not handler.stopped:
+        tag = node.tag
+        entered = False
+        if tag == '-text':
+            handler.text(node.text_content)
+        elif tag[0] != '-':
+            attributes = node.attributes
+            names = ' '.join(filter(None, (attributes.get('class'), attributes.get('id'))))
+            entered = handler.start(node, tag, names)
+
+        child = node.child if entered else None
+        if child is not None:
+            node = child
+            continue
+
+        # Leaving node and any ancestors whose last child it was
+        while node is not None:
+            if entered:
+                handler.end()
+            if node.mem_id == root_id or handler.stopped:
+                node = None
+                break
+            sibling = node.next
+            if sibling is not None:
+                node = sibling
+                break
+            node = node.parent
+            entered = True  # Ancestors were all entered, or we would not be here
+
+
+def main_content_soup(soup, early_stop=True):
+    """Main content text of a BeautifulSoup tree, or None if no block scored"""
+    root = soup.body or soup
+    scorer = DensityScorer(early_stop)
+    walk_soup(root, scorer)
+    if scorer.best is None:
+        return None
+    collector = TextCollector()
+    walk_soup(scorer.best[1], collector)
+    return collector.result()
+
+
+def main_content_lexbor(tree, early_stop=True):
+    """Main content text of a selectolax LexborHTMLParser tree, or None"""
+    root = tree.body or tree.root
+    scorer = DensityScorer(early_stop)
+    walk_lexbor(root, scorer)
+    if scorer.best is None:
+        return None
+    collector = TextCollector()
+    walk_lexbor(scorer.best[1], collector)
+    return collector.result()
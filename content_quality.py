@@ -0,0 +1,124 @@
+"""
+Compares the main content extractors on the saved HTML fixtures: the
+largest content-class block (content='classes', the default) against text/
+link density scoring (content='density'), with and without early stopping.
+
+Fixtures with a fixtures/<name>.gold.txt file holding the hand-picked main
+text are scored by word-level precision, recall and F1; every fixture is
+timed per backend.
+
+Run with: python content_quality.py [--repeat N] [fixture.html ...]
+"""
+import argparse
+import collections
+import glob
+import os
+import sys
+import time
+
+from content_extract import DensityScorer, main_content_soup, walk_lexbor, walk_soup
+from dedup import tokenize
+from extractor import extract_markup
+from parsers import PAGE_BACKENDS, available_backends, make_soup
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+MODES = ['classes', 'density']
+
+
+def word_scores(extracted, gold):
+    """(precision, recall, F1) of the words of extracted against gold, counting repeats"""
+    found = collections.Counter(tokenize(extracted))
+    expected = collections.Counter(tokenize(gold))
+    overlap = sum((found & expected).values())
+    precision = overlap / sum(found.values()) if found else 0.0
+    recall = overlap / sum(expected.values()) if expected else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if overlap else 0.0
+    return precision, recall, f1
+
+
+def time_extract(markup, backend, content, repeat):
+    """Best milliseconds per extract_markup call out of repeat runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extract_markup(markup, backend, content=content)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+class CountingScorer(DensityScorer):
+    """DensityScorer counting the elements it walks"""
+
+    def __init__(self, early_stop):
+        super().__init__(early_stop)
+        self.elements = 0
+
+    def start(self, node, tag, names):
+        self.elements += 1
+        return super().start(node, tag, names)
+
+
+def walked_share(markup, backend):
+    """Share of the elements the density scorer walked before it stopped, and
+    whether it stopped early"""
+    if backend == 'selectolax':
+        from selectolax.lexbor import LexborHTMLParser
+
+        tree = LexborHTMLParser(markup)
+        root, walk = tree.body or tree.root, walk_lexbor
+    else:
+        soup = make_soup(markup, backend)
+        root, walk = soup.body or soup, walk_soup
+    early, full = CountingScorer(early_stop=True), CountingScorer(early_stop=False)
+    walk(root, early)
+    walk(root, full)
+    return early.elements / full.elements if full.elements else 1.0, early.stopped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='*', help="fixtures to compare (default: all)")
+    parser.add_argument('--repeat', type=int, default=20, help="timing runs per page")
+    args = parser.parse_args(argv)
+
+    paths = args.paths or sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html')))
+    backends = available_backends(PAGE_BACKENDS)
+    print(f"Backends: {', '.join(backends)}")
+
+    for path in paths:
+        with open(path, 'rb') as f:
+            markup = f.read()
+        name = os.path.basename(path)
+        gold_path = os.path.splitext(path)[0] + '.gold.txt'
+        gold = None
+        if os.path.exists(gold_path):
+            with open(gold_path, encoding='utf-8') as f:
+                gold = f.read()
+
+        print(f"\n{name}")
+        for mode in MODES:
+            # Extraction is identical across backends (parser_equivalence), so
+            # quality is scored on the reference parse only
+            text = extract_markup(markup, 'html.parser', content=mode)['content']
+            if gold is not None:
+                precision, recall, f1 = word_scores(text, gold)
+                quality = f"P {precision:.2f} R {recall:.2f} F1 {f1:.2f}"
+            else:
+                quality = "(no gold text)"
+            timings = '  '.join(f"{backend} {time_extract(markup, backend, mode, args.repeat):.2f} ms"
+                                for backend in backends)
+            print(f"  {mode:<8} {len(tokenize(text)):>5} words  {quality:<24} {timings}")
+
+        for backend in backends:
+            share, stopped = walked_share(markup, backend)
+            if stopped:
+                print(f"  early stop ({backend}) after {share:.0%} of the elements")
+        if main_content_soup(make_soup(markup, 'html.parser'), early_stop=False) != \
+                extract_markup(markup, 'html.parser', content='density')['content']:
+            print("  note: early stop picked a different block than the full pass")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
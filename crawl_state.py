@@ -0,0 +1,71 @@
+"""
+Persistent state for incremental crawls.
+
+Remembers the URLs and content hashes of articles collected by earlier runs
+and the newest article date seen (the watermark), so a daily crawl can stop
+paginating as soon as it reaches articles it already has.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def article_hash(article):
+    """Content hash of an article, independent of its URL"""
+    text = ' '.join([article.get('title') or '', article.get('excerpt') or ''])
+    return hashlib.sha1(' '.join(text.split()).lower().encode('utf-8')).hexdigest()
+
+
+class CrawlState:
+    """Seen article URLs/hashes and the date watermark, stored as JSON"""
+
+    def __init__(self, path="crawl_state.json"):
+        self.path = path
+        self.urls = set()
+        self.hashes = set()
+        self.watermark = None  # Newest article date seen by earlier runs
+        self.newest = None     # Newest article date seen by this run
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.urls = set(state.get('urls', []))
+            self.hashes = set(state.get('hashes', []))
+            if state.get('watermark'):
+                self.watermark = datetime.strptime(state['watermark'], DATE_FORMAT)
+
+    def is_known(self, article):
+        """Whether the article was collected by an earlier run"""
+        if article.get('url') and article['url'] in self.urls:
+            return True
+        return article_hash(article) in self.hashes
+
+    def is_older(self, article):
+        """Whether the article is dated before the watermark"""
+        date = article.get('date')
+        return bool(date and self.watermark and date < self.watermark)
+
+    def add(self, article):
+        """Record a newly collected article"""
+        if article.get('url'):
+            self.urls.add(article['url'])
+        self.hashes.add(article_hash(article))
+        date = article.get('date')
+        if date and (self.newest is None or date > self.newest):
+            self.newest = date
+
+    def save(self):
+        """Write the state atomically; the watermark only moves forward"""
+        watermark = max(filter(None, [self.watermark, self.newest]), default=None)
+        state = {
+            'urls': sorted(self.urls),
+            'hashes': sorted(self.hashes),
+            'watermark': watermark.strftime(DATE_FORMAT) if watermark else None,
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
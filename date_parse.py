@@ -0,0 +1,147 @@
+"""
+Date parsing for article listings.
+
+Every pattern is compiled once, at import: numeric dates, English and
+Kannada month names, and relative dates ("2 hours ago", "2 ಗಂಟೆಗಳ ಹಿಂದೆ",
+"yesterday"). The same raw strings come back on every page of a listing, so
+results are memoized in an LRU cache, and parse_dates converts a whole
+column by parsing each distinct string only once.
+"""
+import re
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+
+MONTHS = {
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6,
+    'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'jun': 6, 'jul': 7, 'aug': 8,
+    'sep': 9, 'sept': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+    # Kannada
+    'ಜನವರಿ': 1, 'ಫೆಬ್ರವರಿ': 2, 'ಮಾರ್ಚ್': 3, 'ಏಪ್ರಿಲ್': 4, 'ಮೇ': 5, 'ಜೂನ್': 6,
+    'ಜುಲೈ': 7, 'ಆಗಸ್ಟ್': 8, 'ಸೆಪ್ಟೆಂಬರ್': 9, 'ಅಕ್ಟೋಬರ್': 10, 'ನವೆಂಬರ್': 11, 'ಡಿಸೆಂಬರ್': 12,
+}
+
+# Units of relative dates; months and years are approximated as 30 and 365 days
+UNITS = {
+    'second': timedelta(seconds=1), 'minute': timedelta(minutes=1), 'hour': timedelta(hours=1),
+    'day': timedelta(days=1), 'week': timedelta(weeks=1), 'month': timedelta(days=30),
+    'year': timedelta(days=365),
+    # Kannada stems; the inflected endings (ಗಳ, ದ, ...) are matched loosely
+    'ಸೆಕೆಂಡ': timedelta(seconds=1), 'ನಿಮಿಷ': timedelta(minutes=1), 'ಗಂಟೆ': timedelta(hours=1),
+    'ದಿನ': timedelta(days=1), 'ವಾರ': timedelta(weeks=1), 'ತಿಂಗಳ': timedelta(days=30),
+    'ವರ್ಷ': timedelta(days=365),
+}
+DAYS = {'today': timedelta(0), 'yesterday': timedelta(days=1), 'ಇಂದು': timedelta(0), 'ನಿನ್ನೆ': timedelta(days=1)}
+COUNT_WORDS = {'a': 1, 'an': 1, 'one': 1}
+
+
+def _alternation(words):
+    # Longest first, so 'september' wins over 'sept' and 'sep'
+    return '|'.join(re.escape(word) for word in sorted(words, key=len, reverse=True))
+
+
+MONTH = _alternation(MONTHS)
+ENGLISH_UNIT = _alternation(word for word in UNITS if word.isascii())
+KANNADA_UNIT = _alternation(word for word in UNITS if not word.isascii())
+
+# \d also matches Kannada digits, and int() converts them
+DATE_RE = re.compile(
+    r'(?P<iso>(?P<iso_y>\d{4})-(?P<iso_m>\d{1,2})-(?P<iso_d>\d{1,2}))'             # 2024-01-15
+    r'|(?P<dmy>(?P<dmy_d>\d{1,2})[-/.](?P<dmy_m>\d{1,2})[-/.](?P<dmy_y>\d{4}))'     # 15/01/2024
+    rf'|(?<![a-z])(?P<mdy>(?P<mdy_m>{MONTH})\.?\s+(?P<mdy_d>\d{{1,2}})(?:st|nd|rd|th)?,?\s+'
+    r'(?P<mdy_y>\d{4}))'                                                            # January 15, 2024
+    r'|(?P<dmony>(?P<dmony_d>\d{1,2})(?:st|nd|rd|th)?\s+'
+    rf'(?P<dmony_m>{MONTH})\.?,?\s+(?P<dmony_y>\d{{4}}))'                           # 15 January 2024
+    rf'|(?P<ago>(?P<ago_n>\d+|an?|one)\s+(?P<ago_unit>{ENGLISH_UNIT})s?\s+ago)'     # 2 hours ago
+    rf'|(?P<hinde>(?:(?P<hinde_n>\d+)\s*)?(?P<hinde_unit>{KANNADA_UNIT})\S*\s+ಹಿಂದೆ)'  # 2 ಗಂಟೆಗಳ ಹಿಂದೆ
+    rf'|(?<![a-z])(?P<day>{_alternation(DAYS)})(?![a-z])',
+    re.IGNORECASE)
+
+
+def _convert(match):
+    """datetime for an absolute date, timedelta (back from now) for a
+    relative one; raises ValueError for impossible dates like 31/02"""
+    kind = match.lastgroup
+    if kind == 'iso':
+        return datetime(int(match['iso_y']), int(match['iso_m']), int(match['iso_d']))
+    if kind == 'dmy':
+        return datetime(int(match['dmy_y']), int(match['dmy_m']), int(match['dmy_d']))
+    if kind in ('mdy', 'dmony'):
+        month = MONTHS[match[f'{kind}_m'].lower()]
+        return datetime(int(match[f'{kind}_y']), month, int(match[f'{kind}_d']))
+    if kind == 'ago':
+        count = match['ago_n'].lower()
+        return UNITS[match['ago_unit'].lower()] * (COUNT_WORDS.get(count) or int(count))
+    if kind == 'hinde':
+        return UNITS[match['hinde_unit']] * (int(match['hinde_n']) if match['hinde_n'] else 1)
+    return DAYS[match['day'].lower()]
+
+
+def _search(text, relative=True):
+    for match in DATE_RE.finditer(text):
+        if not relative and match.lastgroup == 'day':
+            continue
+        try:
+            return match.group(0), _convert(match)
+        except (ValueError, OverflowError):
+            continue  # e.g. 31/02/2024; a later match may still be a date
+    return None
+
+
+# Date element texts repeat across pages; the free text given to find_date
+# does not, so only parse_date goes through the memo
+_cached_search = lru_cache(maxsize=4096)(_search)
+
+
+def _resolve(value, now):
+    if isinstance(value, timedelta):
+        # Relative dates are kept to the day, like the absolute ones
+        return datetime.combine(((now or datetime.now()) - value).date(), time())
+    return value
+
+
+def parse_date(text, now=None):
+    """
+    Return the first date in text as a datetime (midnight of that day), or
+    None. Relative dates count back from now (default: the current time).
+    """
+    if not text:
+        return None
+    found = _cached_search(text.strip())
+    return _resolve(found[1], now) if found else None
+
+
+def find_date(text, now=None):
+    """
+    Search free text (e.g. a whole article teaser) for a date; returns
+    (matched text, datetime) or None. Bare 'today'/'yesterday' are ignored
+    here, since running text uses them for other things.
+    """
+    if not text:
+        return None
+    found = _search(text, relative=False)
+    return (found[0], _resolve(found[1], now)) if found else None
+
+
+def parse_dates(texts, now=None):
+    """
+    Parse a column of date strings (list, array or Series) at once into a
+    datetime64 Series, NaT where no date was found. Each distinct string is
+    parsed once and the results are spread back with one array take.
+    """
+    # Imported here so the scrapers, which only call parse_date, start fast
+    import numpy as np
+    import pandas as pd
+
+    index = texts.index if isinstance(texts, pd.Series) else None
+    codes, uniques = pd.factorize(pd.Series(texts, dtype=object), use_na_sentinel=True)
+    parsed = [parse_date(text, now) if isinstance(text, str) else None for text in uniques]
+    values = np.array([np.datetime64(date) if date else np.datetime64('NaT') for date in parsed]
+                      + [np.datetime64('NaT')], dtype='datetime64[us]')
+    # Missing inputs have code -1, which picks the trailing NaT
+    return pd.Series(values[codes], index=index)
+
+
+def cache_info():
+    """Hit/miss statistics of the date string memo"""
+    return _cached_search.cache_info()
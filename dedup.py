@@ -0,0 +1,196 @@
+"""
+Duplicate and near-duplicate detection across crawls.
+
+Each record gets two fingerprints of its text (title plus content or
+excerpt): a SHA-1 of the normalized text for exact copies, and a 64-bit
+SimHash over word shingles for edited or re-titled copies. Near-duplicates
+are SimHashes at most max_distance bits apart. The SimHash is cut into
+max_distance + 1 bands, so any two such fingerprints share at least one
+band exactly (pigeonhole). The SQLite index only has to look up those band
+values instead of scanning every stored fingerprint.
+"""
+import hashlib
+import sqlite3
+import string
+import time
+
+import numpy as np
+
+from metrics import METRICS
+
+BITS = 64
+PUNCTUATION = str.maketrans('', '', string.punctuation + '“”‘’«»–—…|')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,          -- URL (or content hash) of the first copy
+    content_hash TEXT NOT NULL,
+    simhash INTEGER,                   -- Signed 64-bit; NULL for very short texts
+    added_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_hash ON documents (content_hash);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    doc_id INTEGER NOT NULL,
+    PRIMARY KEY (band, value, doc_id)
+) WITHOUT ROWID;
+"""
+
+
+def record_text(record):
+    """The text a record is compared by"""
+    body = record.get('content') or record.get('excerpt') or ''
+    return ' '.join([record.get('title') or '', body])
+
+
+def tokenize(text):
+    """Lower-case words without punctuation (works for Kannada as well)"""
+    return text.casefold().translate(PUNCTUATION).split()
+
+
+def content_hash(tokens):
+    return hashlib.sha1(' '.join(tokens).encode('utf-8')).hexdigest()
+
+
+def simhash(tokens, shingle_size=3):
+    """64-bit SimHash of the word shingles of tokens (0 if there are none)"""
+    count = len(tokens) - shingle_size + 1
+    if count < 1:
+        return 0
+    digests = b''.join(
+        hashlib.blake2b(' '.join(tokens[i:i + shingle_size]).encode('utf-8'), digest_size=8).digest()
+        for i in range(count))
+    # One row of 64 bits per shingle; each bit position takes a majority vote
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(count, 8), axis=1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 > count
+    return int.from_bytes(np.packbits(votes).tobytes(), 'big')
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def _signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << BITS) if value >= 1 << (BITS - 1) else value
+
+
+class DedupIndex:
+    """Persistent exact and near-duplicate index of records, stored in SQLite"""
+
+    def __init__(self, path="dedup.sqlite", max_distance=3, shingle_size=3, min_shingles=4,
+                 commit_every=100):
+        self.path = path
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        self.min_shingles = min_shingles  # Shorter texts are only matched exactly
+        self.commit_every = commit_every
+        self.pending = 0
+
+        # max_distance + 1 bands of (nearly) equal width covering all 64 bits
+        band_count = max_distance + 1
+        edges = [round(i * BITS / band_count) for i in range(band_count + 1)]
+        self.bands = list(zip(edges[:-1], edges[1:]))
+
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def fingerprint(self, record):
+        """(content hash, SimHash or None) of a record; (None, None) if it has no text"""
+        tokens = tokenize(record_text(record))
+        if not tokens:
+            return None, None
+        digest = content_hash(tokens)
+        if len(tokens) - self.shingle_size + 1 < self.min_shingles:
+            return digest, None
+        return digest, simhash(tokens, self.shingle_size)
+
+    def _band_values(self, fingerprint):
+        return [(band, (fingerprint >> start) & ((1 << (end - start)) - 1))
+                for band, (start, end) in enumerate(self.bands)]
+
+    def find(self, record, fingerprints=None):
+        """
+        Return (key, kind) of a stored copy of record, kind being 'exact' or
+        'near', or None. A stored entry with the record's own key is not a
+        duplicate, so records seen again after a resumed run pass through.
+        """
+        digest, fingerprint = fingerprints or self.fingerprint(record)
+        if digest is None:
+            return None
+        key = record.get('url') or digest
+        row = self.db.execute('SELECT key FROM documents WHERE content_hash = ? AND key != ?',
+                              (digest, key)).fetchone()
+        if row:
+            return row[0], 'exact'
+        if fingerprint is None:
+            return None
+
+        bands = self._band_values(fingerprint)
+        where = ' OR '.join('(b.band = ? AND b.value = ?)' for _ in bands)
+        candidates = self.db.execute(
+            f'SELECT DISTINCT d.key, d.simhash FROM bands b JOIN documents d ON d.id = b.doc_id '
+            f'WHERE ({where}) AND d.key != ?',
+            [value for pair in bands for value in pair] + [key]).fetchall()
+        best = None
+        for candidate_key, candidate in candidates:
+            distance = hamming(fingerprint, candidate % (1 << BITS))
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, candidate_key)
+        return (best[1], 'near') if best else None
+
+    def add(self, record, fingerprints=None):
+        """Store record's fingerprints (a record already stored is left alone)"""
+        digest, fingerprint = fingerprints or self.fingerprint(record)
+        if digest is None:
+            return
+        key = record.get('url') or digest
+        cursor = self.db.execute(
+            'INSERT OR IGNORE INTO documents (key, content_hash, simhash, added_at) VALUES (?, ?, ?, ?)',
+            (key, digest, None if fingerprint is None else _signed(fingerprint), time.time()))
+        if cursor.rowcount and fingerprint is not None:
+            self.db.executemany('INSERT OR IGNORE INTO bands VALUES (?, ?, ?)',
+                                [(band, value, cursor.lastrowid)
+                                 for band, value in self._band_values(fingerprint)])
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.commit()
+
+    def check(self, record):
+        """Return (key, kind) of an earlier copy of record, or None after
+        adding record to the index (records without text are never duplicates)"""
+        fingerprints = self.fingerprint(record)
+        duplicate = self.find(record, fingerprints)
+        if duplicate is None:
+            self.add(record, fingerprints)
+        else:
+            METRICS.inc('duplicates_total', kind=duplicate[1])
+        return duplicate
+
+    def commit(self):
+        self.db.commit()
+        self.pending = 0
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+
+def dedup_records(records, index, link=False):
+    """
+    Pass records through index: duplicates are dropped, or with link kept
+    with a 'duplicate_of' field naming the first copy
+    """
+    for record in records:
+        duplicate = index.check(record)
+        if duplicate is None:
+            yield record
+        elif link:
+            yield dict(record, duplicate_of=duplicate[0])
@@ -0,0 +1,423 @@
+"""
+Distributed crawl workers sharing one frontier.
+
+The frontier lives in a SQLite database in WAL mode, so any number of worker
+processes (on one box, or on several boxes sharing a file system that
+supports SQLite locking) can lease URLs from it. A lease expires after
+lease_timeout seconds, so URLs held by a crashed worker are handed out again
+(at-least-once delivery). Results are keyed by URL and written with
+ON CONFLICT DO NOTHING, so a URL processed twice is still stored once. Every
+lease also reserves the next request slot for its host, which enforces
+per-host rate limits across all workers, not just within one process.
+
+From the command line, seed the frontier once, start workers on every box
+and export the records when they are done:
+    python distributed.py --frontier /shared/frontier.sqlite seed urls.txt
+    python distributed.py --frontier /shared/frontier.sqlite work --processes 4
+    python distributed.py --frontier /shared/frontier.sqlite export -o pages.parquet
+"""
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import requests
+
+from frontier import normalize_url
+from htmlfile_scrap import FIELDNAMES, HEADERS, build_record, iter_urls
+from http_cache import HttpCache
+from metrics import instrument_session
+from parsers import declared_encoding
+from politeness import is_transient, parse_retry_after
+from sinks import make_sink, serialize
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    depth INTEGER NOT NULL DEFAULT 0,
+    priority REAL NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'queued',   -- queued, leased, done or failed
+    available_at REAL NOT NULL DEFAULT 0,   -- Retry delay for queued URLs
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS urls_pending ON urls (state, depth, priority);
+-- The next queued URL of one host, in lease order
+CREATE INDEX IF NOT EXISTS urls_host_queue ON urls (host, depth, priority DESC)
+    WHERE state = 'queued';
+-- Leases of crashed workers, oldest expiry first
+CREATE INDEX IF NOT EXISTS urls_lease_expiry ON urls (lease_expires) WHERE state = 'leased';
+DROP INDEX IF EXISTS urls_available;
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY,
+    next_allowed REAL NOT NULL              -- Earliest time of the next request
+);
+CREATE INDEX IF NOT EXISTS hosts_ready ON hosts (next_allowed);
+CREATE TABLE IF NOT EXISTS results (
+    url TEXT PRIMARY KEY,
+    record TEXT NOT NULL,
+    worker TEXT,
+    finished_at REAL NOT NULL
+);
+"""
+
+
+class SharedFrontier:
+    """URL queue with leases and global per-host pacing, stored in SQLite"""
+
+    def __init__(self, path="frontier.sqlite", lease_timeout=300, host_interval=1.0,
+                 max_attempts=3, retry_delay=30):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.host_interval = host_interval  # Seconds between requests to one host
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        # isolation_level=None: transactions are managed explicitly below
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        # Every queued host needs a hosts row to be leased from (frontiers
+        # created before hosts rows were added on queueing lack some)
+        self.db.execute('INSERT OR IGNORE INTO hosts (host, next_allowed) '
+                        'SELECT DISTINCT host, 0 FROM urls')
+
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can
+        # never lease the same URL
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def add(self, urls, depth=0, priority=0, base=None):
+        """Queue URLs that are not in the frontier yet; return how many were new"""
+        rows = []
+        for url in urls:
+            url = normalize_url(url, base)
+            if url:
+                rows.append((url, urlsplit(url).netloc, depth, priority))
+        if not rows:
+            return 0
+        db = self._transaction()
+        try:
+            before = db.total_changes
+            db.executemany(
+                'INSERT OR IGNORE INTO urls (url, host, depth, priority) VALUES (?, ?, ?, ?)', rows)
+            added = db.total_changes - before
+            db.executemany('INSERT OR IGNORE INTO hosts (host, next_allowed) VALUES (?, 0)',
+                           {(row[1],) for row in rows})
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return added
+
+    def lease(self, worker):
+        """Lease the next URL whose host may be contacted now; returns
+        (url, depth) or None if nothing is available at the moment"""
+        now = time.time()
+        db = self._transaction()
+        try:
+            # Expired leases first: there are only as many leases as workers
+            row = db.execute("""
+                SELECT u.url, u.depth, u.host FROM urls u INDEXED BY urls_lease_expiry
+                JOIN hosts h ON h.host = u.host
+                WHERE u.state = 'leased' AND u.lease_expires <= :now
+                  AND h.next_allowed <= :now
+                ORDER BY u.lease_expires
+                LIMIT 1""", {'now': now}).fetchone()
+            if row is None:
+                # Otherwise the best of the head URLs of the hosts that may
+                # be contacted: one urls_host_queue lookup per ready host
+                # instead of joining and sorting all their queued URLs
+                row = db.execute("""
+                    SELECT u.url, u.depth, u.host FROM (
+                        SELECT (SELECT q.url FROM urls q
+                                WHERE q.host = h.host AND q.state = 'queued'
+                                  AND q.available_at <= :now
+                                ORDER BY q.depth, q.priority DESC
+                                LIMIT 1) AS url
+                        FROM hosts h
+                        WHERE h.next_allowed <= :now) AS heads
+                    JOIN urls u ON u.url = heads.url
+                    ORDER BY u.depth, u.priority DESC
+                    LIMIT 1""", {'now': now}).fetchone()
+            if row is None:
+                db.execute('COMMIT')
+                return None
+            url, depth, host = row
+            db.execute("""
+                UPDATE urls SET state = 'leased', lease_owner = ?, lease_expires = ?,
+                       attempts = attempts + 1
+                WHERE url = ?""", (worker, now + self.lease_timeout, url))
+            db.execute("""
+                INSERT INTO hosts (host, next_allowed) VALUES (?, ?)
+                ON CONFLICT (host) DO UPDATE SET next_allowed = excluded.next_allowed""",
+                (host, now + self.host_interval))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return url, depth
+
+    def complete(self, url, worker, record, links=(), depth=0, max_depth=None):
+        """Store the result for a leased URL (only once, however often it
+        was processed) and queue the links found on the page"""
+        now = time.time()
+        new_links = []
+        if max_depth is None or depth + 1 <= max_depth:
+            for link in links:
+                link = normalize_url(link, url)
+                if link:
+                    new_links.append((link, urlsplit(link).netloc, depth + 1))
+
+        db = self._transaction()
+        try:
+            db.execute("""
+                INSERT INTO results (url, record, worker, finished_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (url) DO NOTHING""",
+                (url, json.dumps(serialize(record), ensure_ascii=False), worker, now))
+            db.execute("""
+                UPDATE urls SET state = 'done', lease_owner = NULL, lease_expires = NULL,
+                       error = NULL
+                WHERE url = ?""", (url,))
+            db.executemany(
+                'INSERT OR IGNORE INTO urls (url, host, depth) VALUES (?, ?, ?)', new_links)
+            db.executemany('INSERT OR IGNORE INTO hosts (host, next_allowed) VALUES (?, 0)',
+                           {(link[1],) for link in new_links})
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def fail(self, url, worker, error, retry_after=None, status=None):
+        """Give a URL back after a failed fetch (status None: no response);
+        transient failures are retried later until max_attempts is reached,
+        others such as a 404 fail the URL right away"""
+        now = time.time()
+        db = self._transaction()
+        try:
+            row = db.execute('SELECT attempts FROM urls WHERE url = ?', (url,)).fetchone()
+            if not is_transient(status) or (row is not None and row[0] >= self.max_attempts):
+                db.execute("""
+                    UPDATE urls SET state = 'failed', lease_owner = NULL, error = ?
+                    WHERE url = ?""", (str(error), url))
+            else:
+                db.execute("""
+                    UPDATE urls SET state = 'queued', lease_owner = NULL, error = ?,
+                           available_at = ?
+                    WHERE url = ?""", (str(error), now + (retry_after or self.retry_delay), url))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def pause_host(self, host, seconds):
+        """Hold off every worker from host, e.g. after a 429 with Retry-After"""
+        until = time.time() + seconds
+        db = self._transaction()
+        try:
+            db.execute("""
+                INSERT INTO hosts (host, next_allowed) VALUES (?, ?)
+                ON CONFLICT (host) DO UPDATE SET
+                    next_allowed = MAX(next_allowed, excluded.next_allowed)""", (host, until))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def stats(self):
+        """Number of URLs in each state"""
+        return dict(self.db.execute('SELECT state, COUNT(*) FROM urls GROUP BY state').fetchall())
+
+    def pending(self):
+        """Whether any URL is still queued or leased"""
+        return self.db.execute(
+            "SELECT 1 FROM urls WHERE state IN ('queued', 'leased') LIMIT 1").fetchone() is not None
+
+    def results(self):
+        """Yield stored records in the order they finished"""
+        for (record,) in self.db.execute('SELECT record FROM results ORDER BY finished_at'):
+            yield json.loads(record)
+
+    def export(self, sink):
+        """Write all stored records to a sinks.Sink; returns the count"""
+        count = 0
+        for record in self.results():
+            sink.write(record)
+            count += 1
+        sink.flush()
+        return count
+
+    def close(self):
+        self.db.close()
+
+
+def run_worker(path="frontier.sqlite", worker=None, follow_links=False, max_depth=None,
+               max_pages=None, poll_interval=0.2, lease_timeout=300, host_interval=1.0,
+               cache_dir=None):
+    """
+    Lease URLs from the shared frontier, scrape them and store the records
+    until nothing is left (or max_pages were done); returns pages done
+    """
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    frontier = SharedFrontier(path, lease_timeout=lease_timeout, host_interval=host_interval)
+    cache = HttpCache(cache_dir) if cache_dir else None
+    session = instrument_session(requests.Session())
+    session.headers.update(HEADERS)
+
+    pages = 0
+    try:
+        while max_pages is None or pages < max_pages:
+            leased = frontier.lease(worker)
+            if leased is None:
+                if not frontier.pending():
+                    break
+                # Everything left is leased elsewhere or its host is cooling down
+                time.sleep(poll_interval)
+                continue
+
+            url, depth = leased
+            host = urlsplit(url).netloc
+            try:
+                if cache is not None:
+                    response = cache.get(session, url, timeout=30)
+                else:
+                    response = session.get(url, timeout=30)
+                if response.status_code in (429, 503):
+                    delay = parse_retry_after(response.headers.get('Retry-After'))
+                    frontier.pause_host(host, delay or frontier.retry_delay)
+                    frontier.fail(url, worker, f"HTTP {response.status_code}", delay,
+                                  status=response.status_code)
+                    continue
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                response = getattr(e, 'response', None)
+                frontier.fail(url, worker, e,
+                              status=response.status_code if response is not None else None)
+                continue
+
+            links = [] if follow_links else None
+            record = build_record(url, response.content, declared_encoding(response), links=links,
+                                  final_url=response.url)
+            frontier.complete(url, worker, record, links or (), depth, max_depth)
+            pages += 1
+    finally:
+        frontier.close()
+        if cache is not None:
+            cache.close()
+    return pages
+
+
+def run_workers(path="frontier.sqlite", processes=4, **kwargs):
+    """Run several workers as local processes; returns total pages done"""
+    with multiprocessing.Pool(processes) as pool:
+        results = [pool.apply_async(run_worker, (path,), kwargs) for _ in range(processes)]
+        return sum(result.get() for result in results)
+
+
+def seed(path, urls, depth=0, priority=0, batch_size=1000):
+    """Queue urls (any iterable, read lazily) in the frontier at path;
+    returns how many were new"""
+    frontier = SharedFrontier(path)
+    added = 0
+    try:
+        urls = iter(urls)
+        while True:
+            batch = list(itertools.islice(urls, batch_size))
+            if not batch:
+                break
+            added += frontier.add(batch, depth, priority)
+    finally:
+        frontier.close()
+    return added
+
+
+def export_to_file(path, output="scraped_data.csv"):
+    """Write the records stored in the frontier at path to output (format by
+    extension, see sinks.make_sink); returns the count"""
+    sink_options = {'fieldnames': FIELDNAMES} if output.endswith('.csv') else {}
+    frontier = SharedFrontier(path)
+    try:
+        with make_sink(output, **sink_options) as sink:
+            return frontier.export(sink)
+    finally:
+        frontier.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Crawl with any number of workers, on one box or several, sharing one "
+                    "SQLite frontier")
+    parser.add_argument('--frontier', default="frontier.sqlite",
+                        help="shared frontier database; on a file system all boxes can lock "
+                             "(default: %(default)s)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="debug logging")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help="queue start URLs")
+    seed_parser.add_argument('urls', nargs='?', default='-',
+                             help="file with one URL per line, '-' for stdin (default)")
+    seed_parser.add_argument('--priority', type=float, default=0,
+                             help="lease priority, higher first among URLs of equal depth")
+
+    work_parser = commands.add_parser('work', help="lease and scrape URLs until none are left")
+    work_parser.add_argument('--processes', type=int, default=1,
+                             help="worker processes on this box (default: %(default)s)")
+    work_parser.add_argument('--follow-links', action='store_true',
+                             help="queue the links found on scraped pages")
+    work_parser.add_argument('--max-depth', type=int, help="depth limit for followed links")
+    work_parser.add_argument('--max-pages', type=int, help="pages per worker process")
+    work_parser.add_argument('--host-interval', type=float, default=1.0,
+                             help="seconds between requests to one host, across all workers "
+                                  "(default: %(default)s)")
+    work_parser.add_argument('--lease-timeout', type=float, default=300,
+                             help="seconds before a leased URL is handed out again "
+                                  "(default: %(default)s)")
+    work_parser.add_argument('--cache-dir', help="HTTP cache directory")
+
+    export_parser = commands.add_parser('export', help="write the stored records to a file")
+    export_parser.add_argument('-o', '--output', default="scraped_data.csv",
+                               help="output file: .csv, .jsonl, .sqlite/.db or .parquet "
+                                    "(default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
+
+    if args.command == 'seed':
+        added = seed(args.frontier, iter_urls(args.urls), priority=args.priority)
+        logger.info("Queued %s new URLs in %s", added, args.frontier)
+    elif args.command == 'work':
+        options = dict(follow_links=args.follow_links, max_depth=args.max_depth,
+                       max_pages=args.max_pages, lease_timeout=args.lease_timeout,
+                       host_interval=args.host_interval, cache_dir=args.cache_dir)
+        if args.processes > 1:
+            pages = run_workers(args.frontier, args.processes, **options)
+        else:
+            pages = run_worker(args.frontier, **options)
+        frontier = SharedFrontier(args.frontier)
+        try:
+            logger.info("Scraped %s pages; frontier: %s", pages, frontier.stats())
+        finally:
+            frontier.close()
+    else:
+        count = export_to_file(args.frontier, args.output)
+        logger.info("Data for %s URLs saved to %s", count, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""
+Single-pass page extractor for htmlfile_scrap.
+
+Walks the parsed tree once and collects the title, meta description, the
+largest content block and every link href. Text lengths of the content
+candidates come from a running character count, so nested candidates no
+longer rebuild each other's text.
+
+The same extraction is implemented for BeautifulSoup trees and for the
+selectolax/lexbor engine; both must return identical fields.
+"""
+import re
+
+from content_extract import main_content_lexbor, main_content_soup
+from parsers import is_utf8, make_soup, page_backend
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # optional fast backend
+    LexborHTMLParser = None
+
+# Same candidate rules scrape_website has always used
+CONTENT_TAGS = frozenset(['article', 'main', 'div', 'section'])
+CONTENT_CLASS_RE = re.compile('(content|article|main|post)')
+
+# Text under these tags gets a special string type in BeautifulSoup and is
+# left out of get_text(); the lexbor walker skips it the same way
+_HIDDEN_TEXT_TAGS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_TEMPLATE_RE = re.compile(r'<template[\s>/]', re.IGNORECASE)
+_TEMPLATE_BYTES_RE = re.compile(rb'<template[\s>/]', re.IGNORECASE)
+
+
+def _is_content_candidate(tag):
+    """Match find_all(CONTENT_TAGS, class_=CONTENT_CLASS_RE)"""
+    classes = tag.get('class')
+    if not classes:
+        return False
+    if isinstance(classes, str):
+        return CONTENT_CLASS_RE.search(classes) is not None
+    for value in classes:
+        if CONTENT_CLASS_RE.search(value):
+            return True
+    return CONTENT_CLASS_RE.search(' '.join(classes)) is not None
+
+
+def extract_page_fields(soup, content='classes'):
+    """
+    Collect title, meta description, main content and hrefs in one traversal.
+    content='density' picks the main content with content_extract's
+    text/link density scoring instead of the largest content-class block.
+    """
+    # bs4 is imported lazily, so runs that only use selectolax never load it
+    from bs4.element import CData, NavigableString, Tag
+
+    # String types counted by Tag.get_text() on the candidate tags
+    text_types = (NavigableString, CData)
+
+    title_tag = None
+    base_href = None
+    meta_description = ""
+    meta_found = False
+    body = None
+    hrefs = []
+
+    text_length = 0      # Characters of visible text seen so far
+    open_blocks = []     # [tag, text_length at start, last descendant, position]
+    position = 0         # Document order of candidates
+    best_tag = None
+    best_length = -1
+    best_position = -1
+
+    for element in soup.descendants:
+        if isinstance(element, Tag):
+            name = element.name
+            if name == 'a':
+                href = element.get('href')
+                if href is not None:
+                    hrefs.append(href)
+            elif name in CONTENT_TAGS:
+                if _is_content_candidate(element):
+                    open_blocks.append([element, text_length, element._last_descendant(), position])
+                    position += 1
+            elif name == 'title':
+                if title_tag is None:
+                    title_tag = element
+            elif name == 'base':
+                if base_href is None:
+                    base_href = element.get('href') or None
+            elif name == 'meta':
+                if not meta_found and element.get('name') == 'description':
+                    meta_found = True
+                    description = element.get('content')
+                    if description:
+                        meta_description = description.strip()
+            elif name == 'body':
+                if body is None:
+                    body = element
+        elif type(element) in text_types:
+            text_length += len(element)
+
+        # Close every candidate whose subtree ends at this element
+        while open_blocks and open_blocks[-1][2] is element:
+            tag, start, _, order = open_blocks.pop()
+            length = text_length - start
+            # Ties keep the earliest block in document order, like max()
+            if length > best_length or (length == best_length and order < best_position):
+                best_tag = tag
+                best_length = length
+                best_position = order
+
+    # Density scoring finds nothing on pages without real paragraphs
+    main_content = main_content_soup(soup) if content == 'density' else None
+    if main_content is None:
+        if best_tag is not None:
+            # Use the largest content block
+            main_content = best_tag.get_text(separator=" ", strip=True)
+        elif body is not None:
+            # Fallback: get body text
+            main_content = body.get_text(separator=" ", strip=True)
+        else:
+            main_content = ""
+
+    return {
+        'title': title_tag.text.strip() if title_tag is not None else "No title found",
+        'meta_description': meta_description,
+        'content': _WHITESPACE_RE.sub(' ', main_content).strip(),
+        'hrefs': hrefs,
+        'base_href': base_href,
+    }
+
+
+def extract_page_fields_lexbor(markup, encoding=None, content='classes'):
+    """Lexbor version of extract_page_fields, working from raw markup"""
+    if isinstance(markup, bytes) and not is_utf8(markup, encoding):
+        # Decode the same way BeautifulSoup would (declared charset, meta tags, sniffing);
+        # UTF-8 bytes go to lexbor as they are, without a str copy of the page
+        from bs4.dammit import UnicodeDammit
+        markup = UnicodeDammit(markup, [encoding] if encoding else [], is_html=True).unicode_markup
+    tree = LexborHTMLParser(markup)
+
+    title_node = None
+    base_href = None
+    meta_description = ""
+    meta_found = False
+    body = None
+    hrefs = []
+
+    text_length = 0
+    hidden_depth = 0     # Number of open script/style ancestors
+    open_blocks = []     # [node, text_length at start, position, mem_id]
+    position = 0
+    best_node = None
+    best_length = -1
+    best_position = -1
+
+    # Nodes are compared by mem_id: LexborNode.__eq__ serializes both nodes
+    root = tree.root
+    root_id = root.mem_id
+    node = root
+    while node is not None:
+        # Entering node
+        tag = node.tag
+        if tag == '-text':
+            if not hidden_depth:
+                text_length += len(node.text_content)
+        elif tag[0] != '-':
+            attributes = node.attributes
+            if tag == 'a':
+                if 'href' in attributes:
+                    hrefs.append(attributes['href'] or '')
+            elif tag in CONTENT_TAGS:
+                if CONTENT_CLASS_RE.search(attributes.get('class') or ''):
+                    open_blocks.append([node, text_length, position, node.mem_id])
+                    position += 1
+            elif tag == 'title':
+                if title_node is None:
+                    title_node = node
+            elif tag == 'base':
+                if base_href is None:
+                    base_href = attributes.get('href') or None
+            elif tag == 'meta':
+                if not meta_found and attributes.get('name') == 'description':
+                    meta_found = True
+                    description = attributes.get('content')
+                    if description:
+                        meta_description = description.strip()
+            elif tag == 'body':
+                if body is None:
+                    body = node
+            if tag in _HIDDEN_TEXT_TAGS:
+                hidden_depth += 1
+
+        child = node.child
+        if child is not None:
+            node = child
+            continue
+
+        # Leaving node and any ancestors whose last child it was
+        while node is not None:
+            tag = node.tag
+            if tag in _HIDDEN_TEXT_TAGS:
+                hidden_depth -= 1
+            node_id = node.mem_id
+            if open_blocks and open_blocks[-1][3] == node_id:
+                block, start, order, _ = open_blocks.pop()
+                length = text_length - start
+                if length > best_length or (length == best_length and order < best_position):
+                    best_node = block
+                    best_length = length
+                    best_position = order
+            if node_id == root_id:
+                node = None
+                break
+            sibling = node.next
+            if sibling is not None:
+                node = sibling
+                break
+            node = node.parent
+
+    main_content = main_content_lexbor(tree) if content == 'density' else None
+    if main_content is None:
+        if best_node is not None:
+            main_content = _lexbor_text(best_node)
+        elif body is not None:
+            main_content = _lexbor_text(body)
+        else:
+            main_content = ""
+
+    if title_node is not None:
+        title = ''.join(_lexbor_strings(title_node)).strip()
+    else:
+        title = "No title found"
+
+    return {
+        'title': title,
+        'meta_description': meta_description,
+        'content': _WHITESPACE_RE.sub(' ', main_content).strip(),
+        'hrefs': hrefs,
+        'base_href': base_href,
+    }
+
+
+def _lexbor_strings(node):
+    """Yield the text nodes get_text() would include, in document order"""
+    node_id = node.mem_id
+    for descendant in node.traverse(include_text=True):
+        if descendant.tag != '-text':
+            continue
+        parent = descendant.parent
+        hidden = False
+        while parent is not None and parent.mem_id != node_id:
+            if parent.tag in _HIDDEN_TEXT_TAGS:
+                hidden = True
+                break
+            parent = parent.parent
+        if not hidden:
+            yield descendant.text_content
+
+
+def _lexbor_text(node):
+    """Equivalent of get_text(separator=" ", strip=True)"""
+    return ' '.join(text for text in (s.strip() for s in _lexbor_strings(node)) if text)
+
+
+def extract_markup(markup, backend=None, encoding=None, content='classes'):
+    """
+    Parse markup with the chosen backend and extract the page fields;
+    content is 'classes' (largest content-class block) or 'density'
+    """
+    backend = page_backend(backend)
+    if backend == 'selectolax':
+        if not _has_template(markup):
+            return extract_page_fields_lexbor(markup, encoding, content)
+        # Lexbor keeps <template> contents out of the tree, BeautifulSoup doesn't
+        backend = None
+    return extract_page_fields(make_soup(markup, backend, encoding), content)
+
+
+def _has_template(markup):
+    """Whether markup contains a <template> element"""
+    if isinstance(markup, bytes):
+        return _TEMPLATE_BYTES_RE.search(markup) is not None
+    return _TEMPLATE_RE.search(markup) is not None
+
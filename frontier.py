@@ -0,0 +1,265 @@
+"""
+Crawl frontier for multi-page site crawls.
+
+URLs are canonicalized before anything else looks at them, remembered in a
+Bloom filter that grows with the crawl (a few bits per URL, so millions of
+URLs fit in megabytes) and queued by depth, freshness and host fairness. The
+in-memory heap is capped; anything beyond it spills to a SQLite table that is
+merged back in order.
+"""
+import hashlib
+import heapq
+import math
+import os
+import re
+import sqlite3
+import tempfile
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+# Query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = frozenset([
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid',
+    'yclid', '_ga', '_gl', 'ref_src',
+])
+TRACKING_PREFIXES = ('utm_',)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+PERCENT_ESCAPE_RE = re.compile(r'%[0-9a-fA-F]{2}')
+
+
+def normalize_url(url, base=None):
+    """
+    Canonical absolute form of url (resolved against base when relative):
+    lower-case scheme and host, no default port, no fragment, no tracking
+    parameters, upper-case percent escapes. Returns None for links that are
+    not http(s) pages (mailto:, javascript:, tel:, ...).
+    """
+    if not url:
+        return None
+    url = url.strip()
+    if base:
+        url = urljoin(base, url)
+
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    host = parts.hostname.lower().rstrip('.')
+    if ':' in host:
+        host = f'[{host}]'  # IPv6 literal
+    if port and port != DEFAULT_PORTS[scheme]:
+        host = f'{host}:{port}'
+
+    path = PERCENT_ESCAPE_RE.sub(lambda m: m.group(0).upper(), parts.path) or '/'
+    query = parts.query
+    if query:
+        params = parse_qsl(query, keep_blank_values=True)
+        kept = [(key, value) for key, value in params
+                if key not in TRACKING_PARAMS and not key.startswith(TRACKING_PREFIXES)]
+        # Leave the query byte-for-byte alone unless something was dropped
+        if len(kept) != len(params):
+            query = urlencode(kept)
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+class BloomFilter:
+    """Fixed-size probabilistic set: no false negatives, error_rate false positives"""
+
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def add(self, item):
+        """Add item; return True if it was not in the filter before"""
+        bits = self.bits
+        added = False
+        for pos in self._positions(item):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __len__(self):
+        return self.count
+
+
+class ScalableBloomFilter:
+    """
+    Bloom filter that grows with its contents: once the newest slice holds
+    capacity items, a slice twice as large with half the error rate is
+    added, so the overall false positive rate stays below error_rate
+    however many items come in (a full fixed-size filter would silently
+    treat more and more new items as seen)
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        self.error_rate = error_rate
+        # The slice error rates halve, so they add up to at most error_rate
+        self.slices = [BloomFilter(capacity, error_rate / 2)]
+
+    def __contains__(self, item):
+        return any(item in bloom for bloom in self.slices)
+
+    def add(self, item):
+        """Add item; return True if it was not in the filter before"""
+        if item in self:
+            return False
+        bloom = self.slices[-1]
+        if bloom.count >= bloom.capacity:
+            bloom = BloomFilter(bloom.capacity * 2, bloom.error_rate / 2)
+            self.slices.append(bloom)
+        bloom.add(item)
+        return True
+
+    def __len__(self):
+        return sum(len(bloom) for bloom in self.slices)
+
+
+class Frontier:
+    """
+    Priority queue of URLs to crawl.
+
+    Lower depth comes first, then fresher URLs (higher freshness score, e.g.
+    a timestamp), then hosts that have had fewer URLs queued so one big site
+    cannot starve the others. At most max_in_memory entries are kept in the
+    heap; the rest wait in a SQLite spill file.
+    """
+
+    def __init__(self, max_in_memory=100000, spill_path=None, seen=None,
+                 max_depth=None, allowed_hosts=None):
+        self.max_in_memory = max_in_memory
+        self.spill_path = spill_path
+        self.seen = seen if seen is not None else ScalableBloomFilter()
+        self.max_depth = max_depth
+        self.allowed_hosts = set(allowed_hosts) if allowed_hosts else None
+
+        self.heap = []
+        self.host_turns = {}  # Per-host count of queued URLs, for fairness
+        self.sequence = 0     # Keeps insertion order among equal keys
+        self.db = None
+        self.spilled = 0
+        self.disk_head = None  # Smallest spilled entry, cached
+
+    def add(self, url, depth=0, freshness=0, base=None):
+        """Queue url unless it was seen before or is filtered out;
+        return the normalized URL if it was queued, else None"""
+        url = normalize_url(url, base)
+        if url is None:
+            return None
+        if self.max_depth is not None and depth > self.max_depth:
+            return None
+        host = urlsplit(url).netloc
+        if self.allowed_hosts is not None and host not in self.allowed_hosts:
+            return None
+        if not self.seen.add(url):
+            return None
+
+        turn = self.host_turns.get(host, 0)
+        self.host_turns[host] = turn + 1
+        self.sequence += 1
+        entry = (depth, -freshness, turn, self.sequence, url)
+        if len(self.heap) < self.max_in_memory:
+            heapq.heappush(self.heap, entry)
+        else:
+            self._spill(entry)
+        return url
+
+    def pop(self):
+        """Return (url, depth) of the next URL to crawl, or None when empty"""
+        if self.heap and (self.disk_head is None or self.heap[0] <= self.disk_head):
+            entry = heapq.heappop(self.heap)
+        elif self.disk_head is not None:
+            entry = self.disk_head
+            self._unspill(entry)
+        else:
+            return None
+
+        # Pull spilled entries back once the heap has room again
+        if self.spilled and len(self.heap) < self.max_in_memory // 2:
+            self._refill(self.max_in_memory // 2)
+        return entry[4], entry[0]
+
+    def __len__(self):
+        return len(self.heap) + self.spilled
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+            if self.spill_path is None:
+                os.remove(self._db_path)
+
+    # Spill file
+    def _open_db(self):
+        if self.spill_path is None:
+            fd, self._db_path = tempfile.mkstemp(suffix='.frontier.sqlite')
+            os.close(fd)
+        else:
+            self._db_path = self.spill_path
+        self.db = sqlite3.connect(self._db_path)
+        self.db.execute('PRAGMA journal_mode=OFF')
+        self.db.execute('PRAGMA synchronous=OFF')
+        self.db.execute('DROP TABLE IF EXISTS frontier')
+        self.db.execute("""
+            CREATE TABLE frontier (
+                depth INTEGER, freshness REAL, turn INTEGER, seq INTEGER, url TEXT,
+                PRIMARY KEY (depth, freshness, turn, seq)
+            ) WITHOUT ROWID""")
+
+    def _spill(self, entry):
+        if self.db is None:
+            self._open_db()
+        self.db.execute('INSERT INTO frontier VALUES (?, ?, ?, ?, ?)', entry)
+        self.spilled += 1
+        if self.disk_head is None or entry < self.disk_head:
+            self.disk_head = entry
+
+    def _unspill(self, entry):
+        self.db.execute('DELETE FROM frontier WHERE depth = ? AND freshness = ? AND turn = ? AND seq = ?',
+                        entry[:4])
+        self.spilled -= 1
+        self.disk_head = self._read_head()
+
+    def _read_head(self):
+        if not self.spilled:
+            return None
+        row = self.db.execute('SELECT * FROM frontier ORDER BY depth, freshness, turn, seq LIMIT 1').fetchone()
+        return tuple(row) if row else None
+
+    def _refill(self, limit):
+        rows = self.db.execute('SELECT * FROM frontier ORDER BY depth, freshness, turn, seq LIMIT ?',
+                               (limit,)).fetchall()
+        if not rows:
+            return
+        last = rows[-1]
+        self.db.execute('DELETE FROM frontier WHERE (depth, freshness, turn, seq) <= (?, ?, ?, ?)',
+                        last[:4])
+        for row in rows:
+            heapq.heappush(self.heap, tuple(row))
+        self.spilled -= len(rows)
+        self.disk_head = self._read_head()
@@ -0,0 +1,96 @@
+"""
+Lease speed of the shared frontier in distributed.py.
+
+Every lease runs under BEGIN IMMEDIATE, so its duration caps the leases per
+second of all workers together. The frontier is filled with many queued
+URLs spread over a number of hosts, and leases are timed with every host
+ready, with few hosts and with most hosts cooling down. Each lease is also
+checked against a full scan: it must hand out a URL of the lowest depth and
+highest priority among the hosts that may be contacted.
+
+Run with: python frontier_bench.py [--urls N] [--leases N]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from distributed import SharedFrontier
+
+# (name, hosts, hosts cooling down)
+SCENARIOS = [
+    ('all hosts ready', 50, 0),
+    ('three hosts', 3, 0),
+    ('49 of 50 cooling', 50, 49),
+]
+
+BEST_QUERY = """
+    SELECT u.depth, u.priority FROM urls u JOIN hosts h ON h.host = u.host
+    WHERE u.state = 'queued' AND u.available_at <= :now AND h.next_allowed <= :now
+    ORDER BY u.depth, u.priority DESC
+    LIMIT 1"""
+
+
+def fill(frontier, urls, hosts, cooling, seed=0):
+    """Queue urls URLs over hosts hosts and hold off the first cooling hosts"""
+    rng = random.Random(seed)
+    batch = []
+    for i in range(urls):
+        batch.append(f'https://host{i % hosts}.example.com/page/{i}')
+        if len(batch) == 1000:
+            frontier.add(batch, depth=rng.randrange(4), priority=rng.random())
+            batch = []
+    frontier.add(batch, depth=rng.randrange(4), priority=rng.random())
+    for host in range(cooling):
+        frontier.pause_host(f'host{host}.example.com', 3600)
+
+
+def expected(frontier):
+    """(depth, priority) the next lease has to hand out, by a full scan"""
+    return frontier.db.execute(BEST_QUERY, {'now': time.time()}).fetchone()
+
+
+def run(urls, hosts, cooling, leases):
+    """(ms per lease, leases that were not the best pick) for one scenario"""
+    with tempfile.TemporaryDirectory() as directory:
+        # host_interval=0 keeps the ready hosts ready through the run
+        frontier = SharedFrontier(os.path.join(directory, 'frontier.sqlite'), host_interval=0)
+        try:
+            fill(frontier, urls, hosts, cooling)
+            total = 0.0
+            wrong = 0
+            for _ in range(leases):
+                best = expected(frontier)
+                start = time.perf_counter()
+                url, _ = frontier.lease('bench')
+                total += time.perf_counter() - start
+                got = frontier.db.execute('SELECT depth, priority FROM urls WHERE url = ?',
+                                          (url,)).fetchone()
+                wrong += got != best
+            return total / leases * 1000, wrong
+        finally:
+            frontier.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time leases from the shared frontier")
+    parser.add_argument('--urls', type=int, default=200000, help="queued URLs")
+    parser.add_argument('--leases', type=int, default=200, help="timed leases per scenario")
+    args = parser.parse_args(argv)
+
+    print(f"{'scenario':<20}{'hosts':>7}{'ms/lease':>10}{'leases/s':>10}{'wrong':>7}")
+    failures = 0
+    for name, hosts, cooling in SCENARIOS:
+        ms, wrong = run(args.urls, hosts, cooling, args.leases)
+        failures += wrong
+        print(f"{name:<20}{hosts:>7}{ms:>10.3f}{1000 / ms:>10.0f}{wrong:>7}")
+
+    if failures:
+        print(f"\n{failures} lease(s) did not pick the best available URL")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
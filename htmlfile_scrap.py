@@ -1,106 +1,206 @@
 import requests
-from bs4 import BeautifulSoup
+import argparse
 import csv
 import datetime
+import itertools
+import logging
 import os
-import re
+import sys
+import time
+import zlib
 from urllib.parse import urlparse
 
-def scrape_website(url):
+from extractor import extract_markup
+from frontier import Frontier, normalize_url
+from http_cache import HttpCache
+from links import classify_links, resolve_base
+from metrics import METRICS, instrument_session
+from parsers import declared_encoding
+from politeness import HostScheduler
+from records import PageRecord
+from sinks import make_sink
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Keep-alive session shared by the synchronous scrapers; it records
+# Connection setup/TLS/TTFB/download times in METRICS
+SESSION = instrument_session(requests.Session())
+
+# Columns of a scraped data record
+FIELDNAMES = list(PageRecord.FIELDS)
+
+def build_record(url, markup, encoding=None, backend=None, links=None, content='classes',
+                 final_url=None):
+    """
+    Parses downloaded HTML and returns the scraped data record for url;
+    the page's links (absolute, deduplicated) are appended to links when a
+    list is given. final_url is where a redirect ended up, which
+    relative links resolve against.
+    content='density' uses the boilerplate-aware main content extractor.
+    """
+    # Get current date and time
+    now = datetime.datetime.now()
+    date = now.strftime("%Y-%m-%d")
+    time = now.strftime("%H:%M:%S")
+    
+    # Parse and extract title, meta description, main content and links in one pass
+    with METRICS.timer('parse'):
+        fields = extract_markup(markup, backend, encoding, content)
+    main_content = fields['content']
+    
+    # Extract domain
+    domain = urlparse(url).netloc
+    
+    # Classify all links on the page by registrable domain; the crawl also
+    # gets them resolved and deduplicated
+    page_url = final_url or url
+    internal_links_count, external_links_count, page_links = classify_links(
+        fields['hrefs'], page_url, resolve_base(page_url, fields['base_href']),
+        collect=links is not None)
+    if links is not None:
+        links.extend(page_links)
+    METRICS.inc('pages_total', outcome='ok')
+    
+    # word_count is counted from content when first read
+    return PageRecord(date, time, url, domain, fields['title'], fields['meta_description'],
+                      main_content, internal_links_count, external_links_count)
+
+def error_record(url, error):
     """
-    Scrapes content from a website and returns relevant data
+    Returns the placeholder record stored for a URL that could not be scraped
     """
+    logger.warning("Error scraping %s: %s", url, str(error))
+    METRICS.inc('pages_total', outcome='error')
+    now = datetime.datetime.now()
+    return PageRecord(now.strftime("%Y-%m-%d"), now.strftime("%H:%M:%S"), url,
+                      urlparse(url).netloc if url else "", "Error", "",
+                      f"Failed to scrape: {str(error)}", 0, 0, _word_count=0)
+
+def scrape_website(url, backend=None, cache=None, content='classes', scheduler=None, timeout=30):
+    """
+    Scrapes content from a website and returns relevant data; an optional
+    politeness.HostScheduler paces the request per host
+    """
+    host = urlparse(url).netloc
     try:
-        # Send request to the URL
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=30)
+        # Fresh cached copies need neither a request nor a politeness delay
+        response = cache.fresh_response(url) if cache is not None else None
+        if response is None:
+            if scheduler is not None:
+                scheduler.acquire(host)
+            started = time.monotonic()
+            # Send request to the URL (through the HTTP cache if one is given)
+            with METRICS.timer('fetch'):
+                if cache is not None:
+                    response = cache.get(SESSION, url, headers=HEADERS, timeout=timeout)
+                else:
+                    response = SESSION.get(url, headers=HEADERS, timeout=timeout)
+            if scheduler is not None:
+                scheduler.record(host, response.status_code, time.monotonic() - started,
+                                 response.headers.get('Retry-After'))
         response.raise_for_status()  # Raise exception for 4XX/5XX responses
         
-        # Parse HTML content
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Get current date and time
-        now = datetime.datetime.now()
-        date = now.strftime("%Y-%m-%d")
-        time = now.strftime("%H:%M:%S")
-        
-        # Extract page title
-        title = soup.title.text.strip() if soup.title else "No title found"
-        
-        # Extract meta description
-        meta_description = ""
-        meta_tag = soup.find("meta", attrs={"name": "description"})
-        if meta_tag and meta_tag.get("content"):
-            meta_description = meta_tag.get("content").strip()
-        
-        # Extract main content (this is a simple approach, might need customization)
-        # First try to find main content tags
-        main_content = ""
-        content_tags = soup.find_all(['article', 'main', 'div', 'section'], class_=re.compile('(content|article|main|post)'))
-        
-        if content_tags:
-            # Use the largest content block
-            main_content = max(content_tags, key=lambda x: len(x.get_text())).get_text(separator=" ", strip=True)
-        else:
-            # Fallback: get body text
-            body = soup.find('body')
-            if body:
-                main_content = body.get_text(separator=" ", strip=True)
-        
-        # Clean content (remove extra whitespaces)
-        main_content = re.sub(r'\s+', ' ', main_content).strip()
-        
-        # Extract domain
-        domain = urlparse(url).netloc
-        
-        # Count words in content
-        word_count = len(main_content.split())
-        
-        # Find all links on the page
-        links = [a.get('href') for a in soup.find_all('a', href=True)]
-        internal_links = [link for link in links if link.startswith('/') or domain in link]
-        external_links = [link for link in links if not link.startswith('/') and domain not in link]
-        
-        return {
-            'date': date,
-            'time': time,
-            'url': url,
-            'domain': domain,
-            'title': title,
-            'meta_description': meta_description,
-            'content': main_content,
-            'word_count': word_count,
-            'internal_links_count': len(internal_links),
-            'external_links_count': len(external_links)
-        }
+        return build_record(url, response.content, declared_encoding(response), backend=backend,
+                            content=content)
         
     except requests.exceptions.RequestException as e:
-        print(f"Error scraping {url}: {str(e)}")
-        return {
-            'date': datetime.datetime.now().strftime("%Y-%m-%d"),
-            'time': datetime.datetime.now().strftime("%H:%M:%S"),
-            'url': url,
-            'domain': urlparse(url).netloc if url else "",
-            'title': "Error",
-            'meta_description': "",
-            'content': f"Failed to scrape: {str(e)}",
-            'word_count': 0,
-            'internal_links_count': 0,
-            'external_links_count': 0
-        }
+        if scheduler is not None and getattr(e, 'response', None) is None:
+            scheduler.record(host, None)
+        return error_record(url, e)
+
+def scrape_websites_async(urls, concurrency=100, per_host=8, timeout=30, scheduler=None):
+    """
+    Scrapes many URLs concurrently and returns their records in input order
+    """
+    from async_fetch import fetch_all
+    
+    results = fetch_all(urls, concurrency=concurrency, per_host=per_host,
+                        timeout=timeout, headers=HEADERS, scheduler=scheduler)
+    
+    return [parse_fetch_result(result) for result in results]
+
+def parse_fetch_result(result):
+    """
+    Turns an async_fetch.FetchResult into a scraped data record
+    """
+    if result.error:
+        return error_record(result.url, result.error)
+    return build_record(result.url, result.body, result.encoding)
+
+def scrape_websites_pipeline(urls, workers=None, chunk_size=8, queue_size=256,
+                             concurrency=100, per_host=8, timeout=30, scheduler=None):
+    """
+    Fetches URLs concurrently and parses them in a pool of worker processes,
+    yielding records in input order
+    """
+    from async_fetch import fetch_iter
+    from parse_pool import ParsePipeline
+    
+    pipeline = ParsePipeline(parse_fetch_result, workers=workers,
+                             chunk_size=chunk_size, queue_size=queue_size)
+    fetched = fetch_iter(urls, concurrency=concurrency, per_host=per_host,
+                         timeout=timeout, headers=HEADERS, scheduler=scheduler)
+    yield from pipeline.run(fetched)
+
+def crawl_site(start_urls, max_pages=100, max_depth=2, same_host=True, cache=None,
+               backend=None, scheduler=None):
+    """
+    Crawls outward from start_urls by following the links on each page,
+    shallowest pages first, and yields a record per page
+    """
+    hosts = {urlparse(normalize_url(url) or url).netloc for url in start_urls}
+    frontier = Frontier(max_depth=max_depth, allowed_hosts=hosts if same_host else None)
+    scheduler = scheduler or HostScheduler(initial_rate=1.0)
+    for url in start_urls:
+        frontier.add(url)
+    
+    pages = 0
+    try:
+        while frontier and pages < max_pages:
+            url, depth = frontier.pop()
+            host = urlparse(url).netloc
+            logger.info("Crawling %s (depth %s)...", url, depth)
+            pages += 1
+            
+            try:
+                # Fresh cached copies need neither a request nor a politeness delay
+                response = cache.fresh_response(url) if cache is not None else None
+                if response is None:
+                    scheduler.acquire(host)
+                    started = time.monotonic()
+                    if cache is not None:
+                        response = cache.get(SESSION, url, headers=HEADERS, timeout=30)
+                    else:
+                        response = SESSION.get(url, headers=HEADERS, timeout=30)
+                    scheduler.record(host, response.status_code, time.monotonic() - started,
+                                     response.headers.get('Retry-After'))
+                response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                if getattr(e, 'response', None) is None:
+                    scheduler.record(host, None)
+                yield error_record(url, e)
+                continue
+            
+            # Only HTML pages have links worth following
+            is_html = 'html' in response.headers.get('Content-Type', 'text/html')
+            links = [] if is_html else None
+            yield build_record(url, response.content, declared_encoding(response), backend=backend,
+                               links=links, final_url=response.url)
+            for href in links or ():
+                frontier.add(href, depth + 1, base=response.url or url)
+    finally:
+        frontier.close()
 
 def save_to_csv(data_list, filename="scraped_data.csv"):
     """
     Saves scraped data to a CSV file
     """
-    # Define field names for CSV
-    fieldnames = [
-        'date', 'time', 'url', 'domain', 'title', 
-        'meta_description', 'content', 'word_count',
-        'internal_links_count', 'external_links_count'
-    ]
+    # Field names for CSV
+    fieldnames = FIELDNAMES
     
     # Determine if file exists to handle headers
     file_exists = os.path.isfile(filename)
@@ -116,26 +216,183 @@ def save_to_csv(data_list, filename="scraped_data.csv"):
         for data in data_list:
             writer.writerow(data)
     
-    print(f"Data saved to {filename}")
+    logger.info("Data saved to %s", filename)
+
+def iter_urls(source):
+    """
+    Lazily yield the URLs of a file with one URL per line ('-' reads stdin),
+    skipping blank lines and # comments
+    """
+    if source == '-':
+        lines = sys.stdin
+    else:
+        lines = open(source, encoding='utf-8')
+    try:
+        for line in lines:
+            url = line.strip()
+            if url and not url.startswith('#'):
+                yield url
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+def url_shard(url, count):
+    """Shard (0 to count - 1) a URL belongs to; stable across runs and machines"""
+    return zlib.crc32(url.encode('utf-8')) % count
+
+def shard_urls(urls, index, count):
+    """Keep the URLs of shard index out of count"""
+    if count == 1:
+        return urls
+    return (url for url in urls if url_shard(url, count) == index)
+
+def scrape_to_sink(urls, sink, async_mode=False, workers=None, cache_dir=None,
+                   checkpoint_every=100, resume=False, dedup=None, concurrency=100,
+                   per_host=8, timeout=30, scheduler=None, batch_size=1000):
+    """
+    Scrapes urls (any iterable, read lazily) and streams every record into
+    sink as soon as it is ready, checkpointing the number of URLs done so an
+    interrupted run can resume; with a dedup.DedupIndex, pages duplicating
+    earlier ones are left out
+    """
+    if async_mode and cache_dir:
+        raise ValueError("The HTTP cache only works with serial scraping, not async_mode")
+    offset = 0
+    if resume:
+        offset = (sink.resume() or {}).get('offset', 0)
+        if offset:
+            logger.info("Resuming after %s URLs", offset)
+    remaining = itertools.islice(urls, offset, None)
+    
+    if async_mode and workers:
+        # Fetch concurrently and parse in separate processes
+        logger.info("Scraping with %s parser processes...", workers)
+        records = scrape_websites_pipeline(remaining, workers=workers, concurrency=concurrency,
+                                           per_host=per_host, timeout=timeout, scheduler=scheduler)
+    elif async_mode:
+        # Fetch concurrently, batch_size URLs at a time so long inputs stay
+        # in constant memory; records come back in the same order as urls
+        logger.info("Scraping concurrently...")
+        
+        def scrape_batches():
+            while True:
+                batch = list(itertools.islice(remaining, batch_size))
+                if not batch:
+                    return
+                yield from scrape_websites_async(batch, concurrency=concurrency, per_host=per_host,
+                                                 timeout=timeout, scheduler=scheduler)
+        records = scrape_batches()
+    else:
+        # Reuse earlier downloads when a cache directory is given
+        cache = HttpCache(cache_dir) if cache_dir else None
+        
+        def scrape_serial():
+            for url in remaining:
+                logger.info("Scraping %s...", url)
+                yield scrape_website(url, cache=cache, scheduler=scheduler, timeout=timeout)
+        records = scrape_serial()
+    
+    done = offset
+    for record in records:
+        # Failed pages have no content and are never duplicates
+        if dedup is None or not record.word_count or dedup.check(record) is None:
+            sink.write(record)
+        done += 1
+        # Parquet sinks only take a checkpoint once a full row group came in
+        if done % checkpoint_every == 0 and sink.checkpoint_due():
+            sink.checkpoint({'offset': done})
+            if dedup is not None:
+                dedup.commit()
+    sink.checkpoint({'offset': done})
+    if dedup is not None:
+        dedup.commit()
+    return done - offset
+
+def scrape_to_file(urls, output="scraped_data.csv", resume=False, metrics_file=None,
+                   dedup_file=None, **options):
+    """
+    Scrapes urls into output (format by extension, see sinks.make_sink);
+    options go to scrape_to_sink. Returns the number of URLs scraped.
+    """
+    sink_options = {'fieldnames': FIELDNAMES} if output.endswith('.csv') else {}
+    dedup = None
+    if dedup_file:
+        from dedup import DedupIndex  # Loads numpy
+        dedup = DedupIndex(dedup_file)
+    try:
+        with make_sink(output, **sink_options) as sink:
+            scraped = scrape_to_sink(urls, sink, resume=resume, dedup=dedup, **options)
+    finally:
+        if dedup is not None:
+            dedup.close()
+    logger.info("Data for %s URLs saved to %s", scraped, output)
+    
+    # Stage timers and counters in Prometheus text format
+    if metrics_file:
+        METRICS.write_textfile(metrics_file)
+    return scraped
+
+def parse_shard(value):
+    """argparse type for --shard: 'i/N' with 0 <= i < N"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..N-1, got {value!r}")
+    return index, count
 
-def main():
-    # List of URLs to scrape
-    urls = [
-        # Add URLs here
-        "https://example.com",
-        "https://en.wikipedia.org/wiki/Web_scraping"
-    ]
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Scrape the title, description, main content and link counts of a list of URLs")
+    parser.add_argument('urls', nargs='?', default='-',
+                        help="file with one URL per line, '-' for stdin (default)")
+    parser.add_argument('-o', '--output', default="scraped_data.csv",
+                        help="output file: .csv, .jsonl, .sqlite/.db or .parquet "
+                             "(default: %(default)s)")
+    parser.add_argument('--shard', type=parse_shard, default=(0, 1), metavar='i/N',
+                        help="scrape only the URLs hashing to shard i of N; give every "
+                             "shard its own output")
+    parser.add_argument('--async', dest='async_mode', action='store_true',
+                        help="fetch concurrently with aiohttp")
+    parser.add_argument('--workers', type=int,
+                        help="parse in this many processes (with --async)")
+    parser.add_argument('--concurrency', type=int, default=100,
+                        help="concurrent requests in total (with --async)")
+    parser.add_argument('--per-host', type=int, default=8,
+                        help="concurrent requests per host (with --async)")
+    parser.add_argument('--rate', type=float,
+                        help="requests per second per host, adapting down on 429/503 "
+                             "(default: unpaced)")
+    parser.add_argument('--timeout', type=float, default=30, help="request timeout, seconds")
+    parser.add_argument('--cache-dir', help="HTTP cache directory (not with --async)")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue after the URLs recorded in the output's checkpoint")
+    parser.add_argument('--checkpoint-every', type=int, default=100,
+                        help="URLs between checkpoints")
+    parser.add_argument('--dedup', dest='dedup_file', help="duplicate index file to skip copies")
+    parser.add_argument('--metrics', dest='metrics_file',
+                        help="write Prometheus metrics to this file")
+    parser.add_argument('-v', '--verbose', action='store_true', help="debug logging")
+    args = parser.parse_args(argv)
+    if args.cache_dir and args.async_mode:
+        parser.error("--cache-dir cannot be combined with --async")
     
-    # Create a list to store all scraped data
-    all_data = []
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
     
-    for url in urls:
-        print(f"Scraping {url}...")
-        data = scrape_website(url)
-        all_data.append(data)
+    index, count = args.shard
+    urls = shard_urls(iter_urls(args.urls), index, count)
+    scheduler = None
+    if args.rate:
+        scheduler = HostScheduler(min_rate=min(0.05, args.rate), max_rate=args.rate,
+                                  initial_rate=args.rate)
     
-    # Save all data to CSV
-    save_to_csv(all_data)
+    scrape_to_file(urls, output=args.output, resume=args.resume,
+                   metrics_file=args.metrics_file, dedup_file=args.dedup_file,
+                   async_mode=args.async_mode, workers=args.workers, cache_dir=args.cache_dir,
+                   checkpoint_every=args.checkpoint_every, concurrency=args.concurrency,
+                   per_host=args.per_host, timeout=args.timeout, scheduler=scheduler)
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+Persistent HTTP response cache shared by the scrapers.
+
+Responses are indexed by URL in a SQLite database and their bodies are kept
+as zlib-compressed blobs next to it. Entries younger than the TTL are served
+without touching the network; older ones are revalidated with
+If-None-Match / If-Modified-Since and a 304 is answered from the cache.
+The least recently used entries are evicted once the blobs exceed max_bytes.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from metrics import METRICS
+
+# Response headers kept with a cached body
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class HttpCache:
+    """On-disk response cache with conditional revalidation and LRU eviction"""
+
+    def __init__(self, path="http_cache", ttl=3600, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(path, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                blob TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                encoding TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed_at)")
+        self.db.commit()
+        # Compressed bytes in the cache, kept up to date by store() and evict()
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _blob_path(self, blob):
+        return os.path.join(self.blob_dir, blob)
+
+    def lookup(self, url):
+        """Return the index entry for url as a dict, or None"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT blob, size, headers, encoding, stored_at FROM responses WHERE url = ?",
+                (url,)).fetchone()
+        if row is None:
+            return None
+        blob, size, headers, encoding, stored_at = row
+        return {
+            'url': url,
+            'blob': blob,
+            'size': size,
+            'headers': json.loads(headers),
+            'encoding': encoding,
+            'stored_at': stored_at,
+        }
+
+    def is_fresh(self, entry):
+        """Whether an entry may be served without revalidation"""
+        return time.time() - entry['stored_at'] < self.ttl
+
+    def conditional_headers(self, entry):
+        """Validators to send when revalidating an entry"""
+        headers = {}
+        if entry['headers'].get('ETag'):
+            headers['If-None-Match'] = entry['headers']['ETag']
+        if entry['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return headers
+
+    def load_body(self, entry):
+        """Read and decompress the cached body of an entry; None when the blob
+        is gone (evicted, or removed by another process sharing the cache)"""
+        try:
+            with open(self._blob_path(entry['blob']), 'rb') as f:
+                return zlib.decompress(f.read())
+        except FileNotFoundError:
+            self.forget(entry['url'])
+            return None
+
+    def forget(self, url):
+        """Drop the index entry for url"""
+        with self.lock:
+            row = self.db.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is not None:
+                self.db.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self.db.commit()
+                self.total_bytes -= row[0]
+
+    def store(self, url, response):
+        """Cache a successful response"""
+        blob = hashlib.sha1(url.encode('utf-8')).hexdigest() + ".zz"
+        data = zlib.compress(response.content)
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+
+        # Write to a temporary file first so readers never see a partial blob
+        tmp_path = self._blob_path(blob) + f".{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._blob_path(blob))
+
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, blob, len(data), json.dumps(headers), response.encoding, now, now))
+            self.db.commit()
+            self.total_bytes += len(data) - (row[0] if row else 0)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def touch(self, url, revalidated=False):
+        """Mark an entry as used (and as fresh again after a 304)"""
+        now = time.time()
+        with self.lock:
+            if revalidated:
+                self.db.execute("UPDATE responses SET accessed_at = ?, stored_at = ? WHERE url = ?",
+                                (now, now, url))
+            else:
+                self.db.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url))
+            self.db.commit()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        with self.lock:
+            while self.total_bytes > self.max_bytes:
+                rows = self.db.execute(
+                    "SELECT url, blob, size FROM responses ORDER BY accessed_at LIMIT 64").fetchall()
+                if not rows:
+                    self.total_bytes = 0
+                    break
+                for url, blob, size in rows:
+                    if self.total_bytes <= self.max_bytes:
+                        break
+                    self.db.execute("DELETE FROM responses WHERE url = ?", (url,))
+                    try:
+                        os.remove(self._blob_path(blob))
+                    except FileNotFoundError:
+                        pass
+                    self.total_bytes -= size
+            self.db.commit()
+
+    def cached_response(self, entry):
+        """Build a requests.Response for a cache entry, or None if its body
+        is gone"""
+        body = self.load_body(entry)
+        if body is None:
+            return None
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.url = entry['url']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = entry['encoding']
+        response._content = body
+        response.from_cache = True
+        return response
+
+    def fresh_response(self, url):
+        """Return the cached response for url if it is still fresh, else None"""
+        entry = self.lookup(url)
+        if entry is not None and self.is_fresh(entry):
+            response = self.cached_response(entry)
+            if response is not None:
+                self.touch(url)
+                METRICS.inc('cache_requests_total', result='fresh')
+            return response
+        return None
+
+    def get(self, session, url, headers=None, timeout=30):
+        """GET url through the cache; session may be requests or a requests.Session"""
+        cached = self.fresh_response(url)
+        if cached is not None:
+            return cached
+
+        entry = self.lookup(url)
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            request_headers.update(self.conditional_headers(entry))
+
+        response = session.get(url, headers=request_headers, timeout=timeout)
+        if response.status_code == 304 and entry is not None:
+            # Unchanged on the server: serve the stored body
+            cached = self.cached_response(entry)
+            if cached is not None:
+                self.touch(url, revalidated=True)
+                METRICS.inc('cache_requests_total', result='revalidated')
+                return cached
+            # The body went missing meanwhile; fetch it in full
+            response = session.get(url, headers=headers, timeout=timeout)
+        
+        METRICS.inc('cache_requests_total', result='miss')
+
+        response.from_cache = False
+        if response.status_code == 200:
+            self.store(url, response)
+        return response
+
+    def close(self):
+        with self.lock:
+            self.db.close()
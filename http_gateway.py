@@ -1,14 +1,40 @@
-# Install required packages
-!pip install requests beautifulsoup4 pandas
+# Required packages: pip install requests beautifulsoup4 pandas
 
+import argparse
+import csv
+import itertools
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
+import logging
+import sys
 import time
 from datetime import datetime
 import re
 import random
 import os
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from parsers import declared_encoding, make_soup
+from crawl_state import CrawlState
+from date_parse import find_date, parse_date
+from frontier import normalize_url
+from metrics import METRICS, instrument_session, timed
+from politeness import HostScheduler
+from records import ArticleRecord
+from selector_plan import SelectorPlan
+from sinks import CsvSink, JsonLinesSink, ParquetSink, resume_sinks
+
+logger = logging.getLogger(__name__)
+
+PAGE_TEMPLATE_RE = re.compile(r'^(.*/page/)(\d+)(/?(?:\?.*)?)$')  # WordPress-style pagination
+
+# Next-page link selectors, in the order they are tried
+NEXT_SELECTORS = [
+    '.next', '.pagination a', 'a.next', 'a[rel="next"]',
+    '.nav-previous a', '.nav-links a', '.page-numbers.next',
+    'a:contains("Next")', 'a:contains("Next Page")', 'a:contains("»")'
+]
 
 class SimpleKudlaScraper:
     def __init__(self):
@@ -17,7 +43,51 @@ class SimpleKudlaScraper:
         self.end_date = datetime.now()
         self.data = []
         self.output_file = "times_of_kudla_data.csv"
-        self.debug_file = "debug_html.html"
+        self.debug_file = "debug_html.html"  # First page as received; .gz to compress
+        self.parser_backend = None  # Fastest installed BeautifulSoup backend
+        self.plan = SelectorPlan()  # Compiled selectors, learns winners per site
+        self.cache = None  # Optional http_cache.HttpCache for recrawls
+        
+        # Optional site_profiles.SiteProfiles: the container, field and
+        # next-page selectors that won on a site are reused by later pages
+        # and runs, and the full selector search only runs when they stop
+        # matching
+        self.profiles = None
+        
+        # Paces requests per host, adapting to latency, 429/503 and Retry-After
+        self.scheduler = HostScheduler(min_rate=0.05, max_rate=1.0, initial_rate=0.5)
+        
+        # Incremental mode stops at articles collected by earlier runs and
+        # appends new ones to the existing output
+        self.incremental = False
+        self.state_file = "crawl_state.json"
+        self.state = None
+        
+        # Number of pages to fetch ahead once the URLs follow a page/N pattern
+        # (0 keeps the strictly serial crawl)
+        self.prefetch = 0
+        self.too_old = 0  # Articles skipped for being older than start_date
+        self.max_pages = 50  # Safety limit on listing pages per run
+        
+        # Streaming mode writes each page's articles straight to the CSV and a
+        # JSON-lines backup (or to a Parquet dataset when output_file ends in
+        # .parquet) instead of keeping them all in memory; resume continues an
+        # interrupted streaming crawl from its last checkpoint
+        self.stream = False
+        self.resume = False
+        self.sinks = []
+        self.checkpoint_every = 1  # Pages between checkpoints (Parquet: and a full row group)
+        self.article_count = 0
+        
+        # Prometheus text file with the stage timers and counters, written
+        # when run() finishes
+        self.metrics_file = None
+        
+        # Optional dedup.DedupIndex: articles already collected under another
+        # URL or title (syndicated or lightly edited copies) are dropped, or
+        # with dedup_link kept with duplicate_of naming the first copy
+        self.dedup = None
+        self.dedup_link = False
         
         # Create a session with multiple user agents to rotate
         self.user_agents = [
@@ -26,95 +96,108 @@ class SimpleKudlaScraper:
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:96.0) Gecko/20100101 Firefox/96.0",
             "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.45 Safari/537.36"
         ]
-        self.session = requests.Session()
+        # Records connection setup/TLS/TTFB/download times in METRICS
+        self.session = instrument_session(requests.Session())
         
     def get_random_user_agent(self):
         """Return a random user agent from the list"""
         return random.choice(self.user_agents)
     
     def fetch_page(self, url, max_retries=3):
-        """Fetch and parse a webpage with retry logic"""
+        """Fetch and parse a webpage with retry logic; returns (soup, URL of
+        the page after redirects) or None"""
+        page = self.fetch_raw(url, max_retries)
+        if page is None:
+            return None
+        html, encoding, page_url = page
+        return self.parse_html(html, encoding), page_url
+    
+    @timed('parse')
+    def parse_html(self, html, encoding=None):
+        """Parse downloaded HTML; kept apart from fetching so it can run in a parse pool"""
+        return make_soup(html, self.parser_backend, encoding)
+    
+    def save_debug_html(self, body):
+        """Write a response body as received; a debug_file ending in .gz is gzipped"""
+        opener = gzip.open if self.debug_file.endswith('.gz') else open
+        with opener(self.debug_file, "wb") as f:
+            f.write(body)
+        logger.debug("Saved debug HTML to %s", self.debug_file)
+    
+    def fetch_raw(self, url, max_retries=3):
+        """
+        Download a webpage with retry logic and return (body bytes, declared
+        encoding or None, URL after redirects) without decoding or parsing it
+        """
+        host = urlparse(url).netloc
         for attempt in range(max_retries):
+            if attempt:
+                METRICS.inc('fetch_retries_total')
             try:
                 # Use a different user agent for each attempt
                 headers = {"User-Agent": self.get_random_user_agent()}
                 
-                # Add a small random delay to mimic human behavior
-                time.sleep(random.uniform(1, 3))
+                # Fresh cached copies need neither a request nor a delay
+                response = self.cache.fresh_response(url) if self.cache is not None else None
                 
-                print(f"Fetching URL (attempt {attempt+1}): {url}")
-                response = self.session.get(url, headers=headers, timeout=30)
+                if response is None:
+                    # Wait for this host's turn (backoff after failures included)
+                    METRICS.observe('stage_seconds', self.scheduler.acquire(host), stage='wait')
+                    
+                    logger.debug("Fetching URL (attempt %s): %s", attempt+1, url)
+                    started = time.monotonic()
+                    with METRICS.timer('fetch'):
+                        if self.cache is not None:
+                            response = self.cache.get(self.session, url, headers=headers, timeout=30)
+                        else:
+                            response = self.session.get(url, headers=headers, timeout=30)
+                    self.scheduler.record(host, response.status_code, time.monotonic() - started,
+                                          response.headers.get('Retry-After'))
                 
                 # Log status code
-                print(f"Status code: {response.status_code}")
+                logger.debug("Status code: %s", response.status_code)
+                if getattr(response, 'from_cache', False):
+                    logger.debug("Served from cache")
                 
                 # Handle common HTTP errors
                 if response.status_code == 200:
                     # Save the HTML for debugging if this is the first page
                     if url == self.base_url:
-                        with open(self.debug_file, "w", encoding="utf-8") as f:
-                            f.write(response.text)
-                        print(f"Saved debug HTML to {self.debug_file}")
+                        self.save_debug_html(response.content)
                     
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    return soup
+                    # The parser decodes the bytes itself, so the page never
+                    # exists as both bytes and str
+                    return response.content, declared_encoding(response), response.url or url
                 elif response.status_code == 403 or response.status_code == 409:
-                    print("Access forbidden. Website may have anti-scraping measures.")
+                    logger.warning("Access forbidden. Website may have anti-scraping measures.")
                 elif response.status_code == 404:
-                    print("Page not found.")
+                    logger.warning("Page not found.")
                     return None
                 elif response.status_code == 500:
-                    print("Server error.")
+                    logger.warning("Server error.")
+                elif response.status_code in (429, 503):
+                    logger.warning("Rate limited by the server.")
                 else:
-                    print(f"Unexpected status code: {response.status_code}")
+                    logger.warning("Unexpected status code: %s", response.status_code)
                 
-                # Wait longer before retrying
-                wait_time = (attempt + 1) * 5
-                print(f"Waiting {wait_time} seconds before retry...")
-                time.sleep(wait_time)
+                # The scheduler holds this host back before the next attempt
+                logger.warning("Backing off %s for %.2f seconds before retry...", host, self.scheduler.pause_remaining(host))
                 
             except requests.exceptions.RequestException as e:
-                print(f"Request error: {e}")
-                time.sleep((attempt + 1) * 5)
+                logger.warning("Request error: %s", e)
+                self.scheduler.record(host, None)
         
-        print(f"Failed to fetch {url} after {max_retries} attempts")
+        logger.warning("Failed to fetch %s after %s attempts", url, max_retries)
+        METRICS.inc('fetch_failures_total')
         return None
     
     def extract_date(self, date_text):
         """Extract and parse date from article"""
         if not date_text:
             return None
-            
-        try:
-            # Clean up the date text
-            date_text = date_text.strip()
-            
-            # Print the date text for debugging
-            print(f"Attempting to parse date: '{date_text}'")
-            
-            # Try different date formats
-            # Format: DD/MM/YYYY or DD-MM-YYYY
-            date_match = re.search(r'(\d{1,2})[-/](\d{1,2})[-/](\d{4})', date_text)
-            if date_match:
-                day, month, year = map(int, date_match.groups())
-                return datetime(year, month, day)
-                
-            # Format: Month DD, YYYY (e.g., January 15, 2024)
-            months = {
-                'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6,
-                'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12
-            }
-            
-            date_match = re.search(r'(\w+)\s+(\d{1,2}),\s+(\d{4})', date_text, re.IGNORECASE)
-            if date_match:
-                month_name, day, year = date_match.groups()
-                month = months.get(month_name.lower(), 1)
-                return datetime(int(year), month, int(day))
-                
-            return None
-        except Exception as e:
-            print(f"Error parsing date '{date_text}': {e}")
-            return None
+        logger.debug("Attempting to parse date: '%s'", date_text)
+        # Numeric, English/Kannada month-name and relative dates, memoized
+        return parse_date(date_text, now=self.end_date)
     
     def is_within_date_range(self, article_date):
         """Check if article date is within our target range"""
@@ -124,57 +207,68 @@ class SimpleKudlaScraper:
     
     def print_page_structure(self, soup):
         """Print the basic structure of the page for debugging"""
-        print("\n==== Page Structure ====")
+        logger.debug("\n==== Page Structure ====")
         
         # Print title
-        print(f"Page title: {soup.title.string if soup.title else 'No title'}")
+        logger.debug("Page title: %s", soup.title.string if soup.title else 'No title')
         
         # Print all heading elements
         headings = soup.find_all(['h1', 'h2', 'h3'])
-        print(f"Found {len(headings)} headings:")
+        logger.debug("Found %s headings:", len(headings))
         for i, heading in enumerate(headings[:5]):  # Show first 5 only
-            print(f"  {i+1}. {heading.get_text().strip()}")
+            logger.debug("  %s. %s", i+1, heading.get_text().strip())
         
         # Print potential article containers
         for container_class in ['post', 'article', 'entry', 'news-item']:
             containers = soup.select(f'.{container_class}')
             if containers:
-                print(f"Found {len(containers)} elements with class '{container_class}'")
+                logger.debug("Found %s elements with class '%s'", len(containers), container_class)
         
         # Print potential pagination elements
         pagination = soup.select('.pagination, .nav-links, .page-numbers')
         if pagination:
-            print(f"Found pagination elements: {len(pagination)}")
+            logger.debug("Found pagination elements: %s", len(pagination))
         
-        print("========================\n")
+        logger.debug("========================\n")
     
-    def extract_articles(self, soup):
-        """Extract articles from the page soup"""
-        articles_found = []
+    @property
+    def site(self):
+        """Domain the learned selectors are kept under"""
+        return urlparse(self.base_url).netloc
+    
+    def site_profile(self):
+        """Profile of the site being scraped, if one was learned"""
+        return self.profiles.get(self.site) if self.profiles is not None else None
+    
+    @timed('extract')
+    def extract_articles(self, soup, page_url=None):
+        """Extract articles from the page soup; relative links are resolved
+        against page_url (default: the first listing page)"""
+        page_url = page_url or self.base_url
+        # Fast path: only the container selectors that found articles on this
+        # site before. The profile still matches as long as they find articles
+        # (or articles outside the date range)
+        profile = self.site_profile()
+        if profile and profile.get('containers'):
+            too_old_before = self.too_old
+            unique_articles = self.unique_articles(self.collect_articles(soup, profile['containers'], page_url))
+            if unique_articles or self.too_old > too_old_before:
+                METRICS.inc('site_profile_total', part='containers', outcome='hit')
+                logger.debug("Found %s unique articles with the site profile", len(unique_articles))
+                return [article for _, article in unique_articles]
+            METRICS.inc('site_profile_total', part='containers', outcome='miss')
+            logger.info("Site profile for %s no longer matches, searching all selectors", self.site)
         
-        # Print page structure for debugging
-        self.print_page_structure(soup)
+        # Print page structure for debugging (skipped entirely unless enabled)
+        if logger.isEnabledFor(logging.DEBUG):
+            self.print_page_structure(soup)
         
         # Try different selectors for article containers
-        container_selectors = [
-            '.post', 'article', '.entry', '.news-item', '.card',
-            'div.content > div', 'div.main > div', '.main-content > div',
-            '.post-box', '.article-box'
-        ]
-        
-        for selector in container_selectors:
-            containers = soup.select(selector)
-            print(f"Found {len(containers)} potential article containers with selector '{selector}'")
-            
-            if containers:
-                for container in containers:
-                    article_data = self.extract_article_data(container)
-                    if article_data:
-                        articles_found.append(article_data)
+        articles_found = self.collect_articles(soup, page_url=page_url)
         
         # If no articles found with specific selectors, try a more general approach
         if not articles_found:
-            print("No articles found with specific selectors, trying general approach...")
+            logger.debug("No articles found with specific selectors, trying general approach...")
             
             # Find all divs that might contain articles
             for div in soup.find_all('div', class_=True):
@@ -182,42 +276,66 @@ class SimpleKudlaScraper:
                 title_element = div.find(['h1', 'h2', 'h3', 'h4'])
                 
                 if title_element and len(div.get_text().strip()) > 100:  # Must have some substantial content
-                    article_data = self.extract_article_data(div)
+                    article_data = self.extract_article_data(div, page_url)
                     if article_data:
-                        articles_found.append(article_data)
+                        articles_found.append((None, article_data))
+        
+        unique_articles = self.unique_articles(articles_found)
+        logger.debug("Found %s unique articles", len(unique_articles))
         
-        # Remove duplicates (by URL if available, otherwise by title)
+        # The selectors that contributed articles become the site's profile
+        if self.profiles is not None:
+            containers = list(dict.fromkeys(selector for selector, _ in unique_articles if selector))
+            if containers:
+                self.profiles.update(self.site, containers=containers,
+                                     fields=self.plan.winners(self.site))
+        return [article for _, article in unique_articles]
+    
+    def collect_articles(self, soup, selectors=None, page_url=None):
+        """(container selector, article) for the article containers on the
+        page; an element matched by several selectors is only extracted once"""
+        articles_found = []
+        for selector, count, containers in self.plan.iter_containers(soup, selectors):
+            logger.debug("Found %s potential article containers with selector '%s'", count, selector)
+            
+            for container in containers:
+                article_data = self.extract_article_data(container, page_url)
+                if article_data:
+                    articles_found.append((selector, article_data))
+        return articles_found
+    
+    def unique_articles(self, articles_found):
+        """Remove duplicates (by URL if available, otherwise by title) from
+        (selector, article) pairs"""
         unique_articles = []
         seen_urls = set()
         seen_titles = set()
         
-        for article in articles_found:
-            if article['url'] and article['url'] not in seen_urls:
-                seen_urls.add(article['url'])
-                unique_articles.append(article)
-            elif article['title'] not in seen_titles:
-                seen_titles.add(article['title'])
-                unique_articles.append(article)
-        
-        print(f"Found {len(unique_articles)} unique articles")
+        for selector, article in articles_found:
+            if article.url and article.url not in seen_urls:
+                seen_urls.add(article.url)
+                unique_articles.append((selector, article))
+            elif article.title not in seen_titles:
+                seen_titles.add(article.title)
+                unique_articles.append((selector, article))
         return unique_articles
     
-    def extract_article_data(self, article_element):
-        """Extract data from an article element"""
+    def extract_article_data(self, article_element, page_url=None):
+        """Extract data from an article element of the page at page_url"""
         try:
+            site = self.site
+            
             # Try different selectors for title
             title = None
-            for selector in ['h2', '.entry-title', '.post-title', 'h3 a', 'h2 a', 'h3', 'h4 a', 'h4', 'a.title']:
-                title_element = article_element.select_one(selector)
-                if title_element:
-                    title = title_element.get_text().strip()
-                    break
+            _, title_element = self.plan.find(article_element, 'title', site)
+            if title_element:
+                title = title_element.get_text().strip()
             
             # If no title found, try to find any heading
             if not title:
-                title_elements = article_element.select('h1, h2, h3, h4, h5')
-                if title_elements:
-                    title = title_elements[0].get_text().strip()
+                title_element = self.plan.first_heading(article_element)
+                if title_element:
+                    title = title_element.get_text().strip()
             
             # If still no title, this might not be an article
             if not title or len(title) < 5:  # Title should be at least 5 chars
@@ -225,54 +343,41 @@ class SimpleKudlaScraper:
             
             # Try different selectors for URL
             url = None
-            for selector in ['a', 'h2 a', '.entry-title a', '.post-title a', 'h3 a', 'h4 a']:
-                url_element = article_element.select_one(selector)
-                if url_element and url_element.has_attr('href'):
-                    url = url_element['href']
-                    # Make sure URL is absolute
-                    if url.startswith('/'):
-                        # Get domain from base URL
-                        domain_match = re.match(r'^(https?://[^/]+)', self.base_url)
-                        if domain_match:
-                            domain = domain_match.group(1)
-                            url = domain + url
-                    break
+            _, url_element = self.plan.find(article_element, 'url', site,
+                                            accept=lambda element: element.has_attr('href'))
+            if url_element:
+                # Make sure URL is absolute and canonical
+                url = normalize_url(url_element['href'], page_url or self.base_url)
             
             # Try different selectors for date
             date_text = None
             article_date = None
-            for selector in ['.date', '.entry-date', '.post-date', '.time', 'time', '.meta', '.posted-on', '.post-meta']:
-                date_element = article_element.select_one(selector)
-                if date_element:
-                    date_text = date_element.get_text().strip()
-                    article_date = self.extract_date(date_text)
-                    if article_date:
-                        break
+            parsed = {}
+            
+            def parse_date_element(date_element):
+                # Remember the last text tried, parsed or not
+                parsed['text'] = date_element.get_text().strip()
+                parsed['date'] = self.extract_date(parsed['text'])
+                return parsed['date'] is not None
+            
+            self.plan.find(article_element, 'date', site, accept=parse_date_element)
+            if parsed:
+                date_text = parsed['text']
+                article_date = parsed['date']
             
             # If no date found with specific selectors, try to extract from any text
             if not article_date:
-                text = article_element.get_text()
-                # Look for date patterns in the text
-                date_patterns = [
-                    r'(\d{1,2})[-/](\d{1,2})[-/](\d{4})',  # DD/MM/YYYY or DD-MM-YYYY
-                    r'(\w+)\s+(\d{1,2}),\s+(\d{4})'  # Month DD, YYYY
-                ]
-                
-                for pattern in date_patterns:
-                    matches = re.search(pattern, text)
-                    if matches:
-                        date_text = matches.group(0)
-                        article_date = self.extract_date(date_text)
-                        if article_date:
-                            break
+                # Look for date patterns in the text (one scan for all formats)
+                found = find_date(article_element.get_text(), now=self.end_date)
+                if found:
+                    date_text, article_date = found
             
             # Try different selectors for excerpt/content
             excerpt = None
-            for selector in ['.excerpt', '.entry-summary', '.post-excerpt', '.summary', 'p']:
-                excerpt_elements = article_element.select(selector)
-                if excerpt_elements:
-                    excerpt = ' '.join([elem.get_text().strip() for elem in excerpt_elements[:2]])
-                    break
+            index, _ = self.plan.find(article_element, 'excerpt', site)
+            if index is not None:
+                excerpt_elements = self.plan.select(article_element, 'excerpt', index, limit=2)
+                excerpt = ' '.join([elem.get_text().strip() for elem in excerpt_elements])
             
             # If still no excerpt, just use first paragraph or div text
             if not excerpt:
@@ -288,63 +393,69 @@ class SimpleKudlaScraper:
             
             # Skip if date is outside our range (if we have a date)
             if article_date and not self.is_within_date_range(article_date):
-                print(f"Skipping article outside date range: {title} - {article_date}")
+                logger.debug("Skipping article outside date range: %s - %s", title, article_date)
+                if article_date < self.start_date:
+                    self.too_old += 1
                 return None
             
-            article_data = {
-                'title': title,
-                'url': url,
-                'date': article_date,
-                'date_text': date_text,
-                'excerpt': excerpt
-            }
+            article_data = ArticleRecord(title, url, article_date, date_text, excerpt)
             
-            print(f"Extracted article: {title}")
+            logger.debug("Extracted article: %s", title)
             return article_data
             
         except Exception as e:
-            print(f"Error extracting article data: {e}")
+            logger.warning("Error extracting article data: %s", e)
             return None
     
-    def find_next_page_url(self, soup):
-        """Find the URL for the next page"""
+    def match_next_link(self, soup, selector, page_url=None):
+        """URL of the first element matching selector that looks like a
+        next-page link on the page at page_url, or None"""
+        next_elements = soup.select(selector)
+        logger.debug("Found %s elements with selector '%s'", len(next_elements), selector)
+        
+        for element in next_elements:
+            text = element.get_text().strip().lower()
+            href = element.get('href')
+            
+            logger.debug("  - Text: '%s', Link: '%s'", text, href)
+            
+            if href and (
+                'next' in text.lower() or 
+                '»' in text or 
+                '>' in text or 
+                'page' in href
+            ):
+                # Make sure URL is absolute and canonical
+                href = normalize_url(href, page_url or self.base_url) or href
+                logger.debug("Found next page URL: %s", href)
+                return href
+        return None
+    
+    @timed('paginate')
+    def find_next_page_url(self, soup, page_url=None):
+        """Find the URL for the next page after the one at page_url (default:
+        the first listing page)"""
+        page_url = page_url or self.base_url
         try:
             # Print potential next page links for debugging
-            print("\nLooking for next page link...")
+            logger.debug("\nLooking for next page link...")
             
-            # Try different selectors for next page
-            next_selectors = [
-                '.next', '.pagination a', 'a.next', 'a[rel="next"]', 
-                '.nav-previous a', '.nav-links a', '.page-numbers.next',
-                'a:contains("Next")', 'a:contains("Next Page")', 'a:contains("»")'
-            ]
+            # Fast path: the selector that found the next page on this site before
+            profile = self.site_profile()
+            if profile and profile.get('next'):
+                href = self.match_next_link(soup, profile['next'], page_url)
+                if href:
+                    METRICS.inc('site_profile_total', part='next', outcome='hit')
+                    return href
+                METRICS.inc('site_profile_total', part='next', outcome='miss')
             
-            for selector in next_selectors:
-                next_elements = soup.select(selector)
-                print(f"Found {len(next_elements)} elements with selector '{selector}'")
-                
-                for element in next_elements:
-                    text = element.get_text().strip().lower()
-                    href = element.get('href')
-                    
-                    print(f"  - Text: '{text}', Link: '{href}'")
-                    
-                    if href and (
-                        'next' in text.lower() or 
-                        '»' in text or 
-                        '>' in text or 
-                        'page' in href
-                    ):
-                        # Make sure URL is absolute
-                        if href.startswith('/'):
-                            # Get domain from base URL
-                            domain_match = re.match(r'^(https?://[^/]+)', self.base_url)
-                            if domain_match:
-                                domain = domain_match.group(1)
-                                href = domain + href
-                                
-                        print(f"Found next page URL: {href}")
-                        return href
+            # Try different selectors for next page
+            for selector in NEXT_SELECTORS:
+                href = self.match_next_link(soup, selector, page_url)
+                if href:
+                    if self.profiles is not None:
+                        self.profiles.update(self.site, next=selector)
+                    return href
             
             # If no next page link found with clear indicators, look for pagination numbers
             page_numbers = soup.select('.page-numbers, .pagination a')
@@ -358,8 +469,8 @@ class SimpleKudlaScraper:
                     
                 # If we found the current page already, this could be the next page
                 if current_page_found and page_num.has_attr('href'):
-                    print(f"Found next page by pagination: {page_num['href']}")
-                    return page_num['href']
+                    logger.debug("Found next page by pagination: %s", page_num['href'])
+                    return normalize_url(page_num['href'], page_url)
                 
                 # Try to extract page number
                 try:
@@ -375,74 +486,240 @@ class SimpleKudlaScraper:
                     href = link.get('href', '')
                     match = re.search(r'page/(\d+)', href)
                     if match:
-                        print(f"Found page link: {href}")
-                        return href
+                        logger.debug("Found page link: %s", href)
+                        return normalize_url(href, page_url)
                         
-            print("No next page URL found")
+            logger.debug("No next page URL found")
             return None
             
         except Exception as e:
-            print(f"Error finding next page: {e}")
+            logger.warning("Error finding next page: %s", e)
             return None
     
     def scrape_all_pages(self):
         """Scrape all pages with articles in the date range"""
         current_url = self.base_url
         page_num = 1
-        max_pages = 50  # Safety limit
+        max_pages = self.max_pages
+        
+        if self.incremental:
+            self.state = CrawlState(self.state_file)
+            logger.info("Incremental crawl: %s known articles, watermark %s", len(self.state.urls), self.state.watermark)
         
+        if self.stream:
+            position = self.open_sinks()
+            if position:
+                current_url, page_num = position['page_url'], position['page_num']
+                logger.info("Resuming from page %s: %s", page_num, current_url)
+        
+        profile = self.site_profile()
+        if profile:
+            self.plan.learn(self.site, profile.get('fields', {}))
+            logger.info("Using the site profile for %s (updated %s)", self.site, profile.get('updated'))
+        
+        visited = set()  # Normalized page URLs, so pagination loops end
         while current_url and page_num <= max_pages:
-            print(f"\n==== Scraping page {page_num}: {current_url} ====")
+            logger.info("\n==== Scraping page %s: %s ====", page_num, current_url)
+            visited.add(normalize_url(current_url) or current_url)
             
             # Fetch the page
-            soup = self.fetch_page(current_url)
-            if not soup:
-                print(f"Failed to fetch page {page_num}")
+            page = self.fetch_page(current_url)
+            if not page:
+                logger.warning("Failed to fetch page %s", page_num)
                 break
+            soup, page_url = page
             
-            # Extract articles
-            articles = self.extract_articles(soup)
-            
-            # Add valid articles to the dataset
-            new_articles = 0
-            for article in articles:
-                if article:
-                    self.data.append(article)
-                    new_articles += 1
+            new_articles, _ = self.process_page(soup, page_num, page_url)
             
-            print(f"Added {new_articles} new articles from page {page_num}")
+            # In incremental mode a page without new articles means we caught up
+            if self.state is not None and new_articles == 0:
+                logger.info("Reached already collected articles, stopping")
+                break
             
             # Get next page URL
-            next_url = self.find_next_page_url(soup)
+            next_url = self.find_next_page_url(soup, page_url)
             
-            # If no new URL or it's the same as current, stop
-            if not next_url or next_url == current_url:
-                print("No more pages to scrape")
+            # If no new URL or it was already scraped, stop
+            if not next_url or next_url in visited:
+                logger.info("No more pages to scrape")
+                break
+            
+            self.checkpoint(next_url, page_num + 1)
+            
+            # Predictable page/N URLs let us fetch the following pages ahead
+            template = PAGE_TEMPLATE_RE.match(next_url) if self.prefetch > 0 else None
+            if template:
+                self.scrape_prefetched(template, page_num + 1, max_pages)
                 break
                 
             current_url = next_url
             page_num += 1
-            
-            # Be nice to the server
-            delay = random.uniform(3, 7)
-            print(f"Waiting {delay:.2f} seconds before next request...")
-            time.sleep(delay)
+        
+        self.save_profile()
+    
+    def save_profile(self):
+        """Store the field selectors that won on the site and write the profiles"""
+        if self.profiles is None:
+            return
+        if self.site_profile():
+            self.profiles.update(self.site, fields=self.plan.winners(self.site))
+        self.profiles.save()
+    
+    def process_page(self, soup, page_num, page_url=None):
+        """Add a page's articles to the dataset; return (new articles, articles
+        skipped for being older than start_date)"""
+        too_old_before = self.too_old
+        
+        # Extract articles
+        articles = self.extract_articles(soup, page_url)
+        
+        # Add valid articles to the dataset
+        new_articles = 0
+        for article in articles:
+            if not article:
+                continue
+            if self.state is not None:
+                # Skip anything an earlier run already collected
+                if self.state.is_known(article) or self.state.is_older(article):
+                    continue
+                self.state.add(article)
+            if self.dedup is not None:
+                duplicate = self.dedup.check(article)
+                if duplicate and not self.dedup_link:
+                    logger.debug("Skipping %s, duplicate of %s", article.url or article.title, duplicate[0])
+                    continue
+                if self.dedup_link:
+                    article.duplicate_of = duplicate[0] if duplicate else None
+            if self.sinks:
+                for sink in self.sinks:
+                    sink.write(article)
+            else:
+                self.data.append(article)
+            new_articles += 1
+        self.article_count += new_articles
+        METRICS.inc('articles_total', new_articles)
+        
+        logger.info("Added %s new articles from page %s", new_articles, page_num)
+        return new_articles, self.too_old - too_old_before
+    
+    def scrape_prefetched(self, template, page_num, max_pages):
+        """Scrape page/N URLs from page_num on, keeping up to self.prefetch
+        pages in flight; the scheduler still paces the actual requests"""
+        prefix, first_number, suffix = template.group(1), int(template.group(2)), template.group(3)
+        offset = first_number - page_num
+        logger.info("Detected pagination pattern %sN%s, prefetching %s pages", prefix, suffix, self.prefetch)
+        
+        executor = ThreadPoolExecutor(max_workers=self.prefetch)
+        pending = {}
+        next_page = page_num
+        try:
+            while page_num <= max_pages:
+                # Keep the prefetch window full
+                while next_page <= max_pages and next_page < page_num + self.prefetch:
+                    url = f"{prefix}{next_page + offset}{suffix}"
+                    pending[next_page] = (url, executor.submit(self.fetch_page, url))
+                    next_page += 1
+                
+                url, future = pending.pop(page_num)
+                logger.info("\n==== Scraping page %s: %s (prefetched) ====", page_num, url)
+                page = future.result()
+                if not page:
+                    logger.warning("Failed to fetch page %s, stopping", page_num)
+                    break
+                soup, page_url = page
+                
+                new_articles, too_old = self.process_page(soup, page_num, page_url)
+                if new_articles == 0 and too_old:
+                    logger.info("Page is past the date range, stopping")
+                    break
+                if self.state is not None and new_articles == 0:
+                    logger.info("Reached already collected articles, stopping")
+                    break
+                if not self.find_next_page_url(soup, page_url):
+                    logger.info("No more pages to scrape")
+                    break
+                page_num += 1
+                self.checkpoint(f"{prefix}{page_num + offset}{suffix}", page_num)
+        finally:
+            # Drop outstanding prefetches; requests already on the wire just finish
+            for _, future in pending.values():
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def open_sinks(self):
+        """Open the streaming outputs; return the position to resume from, if any"""
+        append = self.incremental or self.resume
+        mode = 'a' if append else 'w'
+        json_file = os.path.splitext(self.output_file)[0] + '.jsonl'
+        if self.output_file.endswith('.parquet'):
+            self.sinks = [ParquetSink(self.output_file, mode=mode)]
+        else:
+            self.sinks = [
+                CsvSink(self.output_file, batch_size=50, mode=mode),
+                JsonLinesSink(json_file, batch_size=50, mode=mode),
+            ]
+        
+        position = None
+        if self.resume:
+            # Roll both files back to the same page boundary
+            position = resume_sinks(self.sinks)
+        logger.info("Streaming articles to %s", ', '.join(sink.path for sink in self.sinks))
+        return position
+    
+    def checkpoint(self, next_url, next_page):
+        """Make articles written so far durable and remember where to continue"""
+        if not self.sinks or (next_page - 1) % self.checkpoint_every:
+            return
+        # A Parquet checkpoint ends a part file, so wait for a full row group
+        if not all(sink.checkpoint_due() for sink in self.sinks):
+            return
+        for sink in self.sinks:
+            sink.checkpoint({'page_url': next_url, 'page_num': next_page})
+        if self.state is not None:
+            self.state.save()
+        if self.dedup is not None:
+            self.dedup.commit()
+    
+    def close_sinks(self, completed=True):
+        """Flush and close the streaming outputs"""
+        for sink in self.sinks:
+            sink.close(completed=completed)
+        self.sinks = []
+        logger.info("Data saved to %s", self.output_file)
+        if completed and self.state is not None:
+            self.state.save()
     
     def save_results(self):
         """Save the scraped data to files"""
+        if self.sinks:
+            self.close_sinks()
+            return
+        
         if not self.data:
-            print("No data to save")
+            logger.info("No data to save")
+            return
+        
+        if self.output_file.endswith('.parquet'):
+            with ParquetSink(self.output_file, mode='a' if self.incremental else 'w') as sink:
+                for article in self.data:
+                    sink.write(article)
+            logger.info("Data saved to %s", self.output_file)
+            if self.state is not None:
+                self.state.save()
             return
             
-        # Save to CSV
-        df = pd.DataFrame(self.data)
+        # Save to CSV (pandas is only imported here, it is slow to load)
+        import pandas as pd
+        df = pd.DataFrame([article.to_dict() for article in self.data])
         
         # Filter out None values and convert date objects to string format
         df['date'] = df['date'].apply(lambda x: x.strftime('%Y-%m-%d') if x else '')
         
-        # Save to CSV
-        df.to_csv(self.output_file, index=False, encoding='utf-8')
-        print(f"Data saved to {self.output_file}")
+        # Save to CSV (appending to earlier runs in incremental mode)
+        append = self.incremental and os.path.exists(self.output_file)
+        df.to_csv(self.output_file, mode='a' if append else 'w', header=not append,
+                  index=False, encoding='utf-8')
+        logger.info("Data %s to %s", 'appended' if append else 'saved', self.output_file)
         
         # Save raw data to JSON as backup
         try:
@@ -452,49 +729,139 @@ class SimpleKudlaScraper:
             # Convert dates to strings for JSON serialization
             json_data = []
             for item in self.data:
-                json_item = item.copy()
+                json_item = item.to_dict()
                 if json_item['date']:
                     json_item['date'] = json_item['date'].strftime('%Y-%m-%d')
                 json_data.append(json_item)
+            
+            if self.incremental and os.path.exists(json_file):
+                with open(json_file, 'r', encoding='utf-8') as f:
+                    json_data = json.load(f) + json_data
                 
             with open(json_file, 'w', encoding='utf-8') as f:
                 json.dump(json_data, f, ensure_ascii=False, indent=2)
-            print(f"Data also saved to {json_file}")
+            logger.info("Data also saved to %s", json_file)
         except Exception as e:
-            print(f"Error saving JSON backup: {e}")
+            logger.error("Error saving JSON backup: %s", e)
+        
+        # Only remember the new articles once they are safely written
+        if self.state is not None:
+            self.state.save()
     
     def run(self):
         """Run the full scraping process"""
         try:
-            print(f"Starting scrape from {self.start_date.strftime('%Y-%m-%d')} to {self.end_date.strftime('%Y-%m-%d')}")
+            logger.info("Starting scrape from %s to %s", self.start_date.strftime('%Y-%m-%d'), self.end_date.strftime('%Y-%m-%d'))
             self.scrape_all_pages()
-            print(f"Scraping complete. Found {len(self.data)} articles.")
+            logger.info("Scraping complete. Found %s articles.", self.article_count)
             self.save_results()
         except Exception as e:
-            print(f"Error during scraping: {e}")
+            logger.error("Error during scraping: %s", e)
             
+            # Streamed articles are already on disk; keep the checkpoint for resume
+            if self.sinks:
+                self.close_sinks(completed=False)
             # Try to save whatever data we collected
-            if self.data:
-                print("Attempting to save partial data...")
+            elif self.data:
+                logger.info("Attempting to save partial data...")
                 self.save_results()
+        finally:
+            if self.dedup is not None:
+                self.dedup.commit()
+            if self.metrics_file:
+                METRICS.write_textfile(self.metrics_file)
 
-# Run the scraper
-print("Starting Times of Kudla scraper...")
-scraper = SimpleKudlaScraper()
-scraper.run()
+def parse_day(value):
+    """argparse type for YYYY-MM-DD dates"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
 
-# Display the results
-if os.path.exists('times_of_kudla_data.csv'):
-    df = pd.read_csv('times_of_kudla_data.csv')
-    print(f"\nSuccessfully scraped {len(df)} articles")
-    print("\nFirst 5 articles:")
-    display(df.head())
-else:
-    print("\nNo data was saved to CSV")
+def main(argv=None):
+    scraper = SimpleKudlaScraper()
+    parser = argparse.ArgumentParser(description="Scrape the Times of Kudla article listing")
+    parser.add_argument('--url', default=scraper.base_url, help="first listing page")
+    parser.add_argument('--start-date', type=parse_day, default=scraper.start_date,
+                        help="oldest article date, YYYY-MM-DD (default: %(default)s)")
+    parser.add_argument('--end-date', type=parse_day, help="newest article date (default: now)")
+    parser.add_argument('-o', '--output', default=scraper.output_file,
+                        help="output file, .csv or .parquet (default: %(default)s)")
+    parser.add_argument('--max-pages', type=int, default=scraper.max_pages,
+                        help="listing pages per run (default: %(default)s)")
+    parser.add_argument('--prefetch', type=int, default=0,
+                        help="listing pages to fetch ahead once the URLs follow page/N")
+    parser.add_argument('--rate', type=float,
+                        help="maximum requests per second (default: adaptive up to 1)")
+    parser.add_argument('--cache-dir', help="HTTP cache directory for recrawls")
+    parser.add_argument('--incremental', action='store_true',
+                        help="stop at articles collected by earlier runs and append new ones")
+    parser.add_argument('--state', default=scraper.state_file,
+                        help="incremental crawl state file (default: %(default)s)")
+    parser.add_argument('--stream', action='store_true',
+                        help="write each page's articles out as they are scraped")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue an interrupted --stream run from its checkpoint")
+    parser.add_argument('--profiles', dest='profile_file',
+                        help="site profile file: reuse the selectors learned on earlier runs")
+    parser.add_argument('--dedup', dest='dedup_file', help="duplicate index file to skip copies")
+    parser.add_argument('--dedup-link', action='store_true',
+                        help="keep duplicates, naming the first copy in duplicate_of")
+    parser.add_argument('--metrics', dest='metrics_file',
+                        help="write Prometheus metrics to this file")
+    parser.add_argument('--debug-file', default=scraper.debug_file,
+                        help="where to save the first page as received (.gz to compress)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="debug logging")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
+    
+    scraper.base_url = args.url
+    scraper.start_date = args.start_date
+    if args.end_date:
+        scraper.end_date = args.end_date
+    scraper.output_file = args.output
+    scraper.max_pages = args.max_pages
+    scraper.prefetch = args.prefetch
+    if args.rate:
+        scraper.scheduler = HostScheduler(min_rate=min(0.05, args.rate), max_rate=args.rate,
+                                          initial_rate=args.rate)
+    if args.cache_dir:
+        from http_cache import HttpCache
+        scraper.cache = HttpCache(args.cache_dir)
+    scraper.incremental = args.incremental
+    scraper.state_file = args.state
+    scraper.stream = args.stream or args.resume
+    scraper.resume = args.resume
+    if args.profile_file:
+        from site_profiles import SiteProfiles
+        scraper.profiles = SiteProfiles(args.profile_file)
+    if args.dedup_file:
+        from dedup import DedupIndex
+        scraper.dedup = DedupIndex(args.dedup_file)
+        scraper.dedup_link = args.dedup_link
+    scraper.metrics_file = args.metrics_file
+    scraper.debug_file = args.debug_file
+    
+    logger.info("Starting Times of Kudla scraper...")
+    try:
+        scraper.run()
+    finally:
+        if scraper.dedup is not None:
+            scraper.dedup.close()
+        if scraper.cache is not None:
+            scraper.cache.close()
+    
+    if not os.path.exists(scraper.output_file):
+        logger.warning("No data was saved to %s", scraper.output_file)
+        return 1
+    logger.info("Successfully scraped %s articles", scraper.article_count)
+    if args.verbose and scraper.output_file.endswith('.csv'):
+        # Only the first rows: the file keeps growing across incremental runs
+        with open(scraper.output_file, newline='', encoding='utf-8') as f:
+            for row in itertools.islice(csv.DictReader(f), 5):
+                logger.debug("%s", row)
+    return 0
 
-# Display saved HTML for debugging
-if os.path.exists('debug_html.html'):
-    with open('debug_html.html', 'r', encoding='utf-8') as f:
-        html_content = f.read()
-    print(f"\nSaved HTML file size: {len(html_content)} bytes")
-    print(f"First 500 characters of HTML:\n{html_content[:500]}...")
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Internal/external link classification: correctness cases and speed.
+
+The old counter called a link internal when it started with '/' or had the
+page's domain anywhere in it. That took 'notexample.com' and
+'example.com.evil.net' for internal, 'page.html' and '//cdn...' for
+external, and counted mailto: links. The cases below pin down what
+classify_links does instead; the timing compares both on synthetic pages of
+many anchors, like the link-heavy index pages of large sites.
+
+Run with: python link_bench.py [--anchors N] [--repeat N]
+"""
+import argparse
+import random
+import sys
+import time
+
+from links import classify_links, registrable_domain
+
+PAGE = 'https://www.example.com/news/today.html'
+
+# (href, expected class on PAGE): 'internal', 'external' or None for neither
+CASES = [
+    ('/about/', 'internal'),
+    ('page.html', 'internal'),
+    ('../archive/?page=2', 'internal'),
+    ('?t=10:30', 'internal'),
+    ('#comments', 'internal'),
+    ('https://www.example.com/', 'internal'),
+    ('http://blog.example.com/post', 'internal'),
+    ('HTTPS://WWW.EXAMPLE.COM/Contact', 'internal'),
+    ('https://user@example.com:8443/x', 'internal'),
+    ('//static.example.com/logo.png', 'internal'),
+    ('https://notexample.com/', 'external'),
+    ('https://example.com.evil.net/example.com', 'external'),
+    ('//cdn.jsdelivr.net/npm/lib.js', 'external'),
+    ('https://twitter.com/share?url=https://www.example.com/', 'external'),
+    ('mailto:desk@example.com', None),
+    ('tel:+15550100', None),
+    ('javascript:void(0)', None),
+]
+
+# (page, href, expected class): registrable domains under multi-label suffixes
+SUFFIX_CASES = [
+    ('https://www.bbc.co.uk/news', 'https://sport.bbc.co.uk/', 'internal'),
+    ('https://www.bbc.co.uk/news', 'https://www.itv.co.uk/', 'external'),
+    ('https://alice.github.io/', 'https://bob.github.io/', 'external'),
+    ('https://alice.github.io/', '/repo/', 'internal'),
+    ('http://127.0.0.1:8000/', 'http://127.0.0.1:8000/x', 'internal'),
+    ('http://localhost/', 'http://localhost:8080/', 'internal'),
+]
+
+# (page, <base href>, href, expected class): <base href> only moves relative links
+BASE_CASES = [
+    ('https://www.example.com/a', 'https://cdn.example.net/', 'https://www.example.com/x', 'internal'),
+    ('https://www.example.com/a', 'https://cdn.example.net/', 'page.html', 'external'),
+    ('https://www.example.com/a', 'https://static.example.com/', 'page.html', 'internal'),
+]
+
+
+def substring_count(hrefs, domain):
+    """The old counter, kept here as the timing baseline"""
+    internal = 0
+    for link in hrefs:
+        if link.startswith('/') or domain in link:
+            internal += 1
+    return internal, len(hrefs) - internal
+
+
+def classify_one(href, page=PAGE, base=None):
+    internal, external, _ = classify_links([href], page, base)
+    return 'internal' if internal else 'external' if external else None
+
+
+def check_cases():
+    """Print every correctness case and return the number that failed"""
+    failures = 0
+    cases = [(PAGE, None, href, expected) for href, expected in CASES]
+    cases += [(page, None, href, expected) for page, href, expected in SUFFIX_CASES]
+    cases += BASE_CASES
+    for page, base, href, expected in cases:
+        got = classify_one(href, page, base)
+        if got != expected:
+            failures += 1
+        print(f"  {'ok' if got == expected else 'FAIL':<5}{href:<48}{got!s:<10}"
+              f"{'' if got == expected else f'expected {expected}'}")
+    return failures
+
+
+def synthetic_hrefs(count, seed=0):
+    """Anchors of a large index page: mostly relative, some to subdomains,
+    a few dozen outside hosts, share and mail links"""
+    rng = random.Random(seed)
+    outside = [f'https://www.site{i}.com/' for i in range(40)] + ['//cdn.jsdelivr.net/npm/x.js']
+    hrefs = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.55:
+            hrefs.append(f'/news/{i}/story-{i}.html')
+        elif roll < 0.65:
+            hrefs.append(f'story-{i}.html')
+        elif roll < 0.8:
+            hrefs.append(f'https://{rng.choice(["www", "sport", "blog"])}.example.com/{i}')
+        elif roll < 0.95:
+            hrefs.append(rng.choice(outside) + str(i))
+        else:
+            hrefs.append(rng.choice(['mailto:desk@example.com', 'javascript:void(0)',
+                                     f'https://twitter.com/share?url={PAGE}']))
+    return hrefs
+
+
+def best_ms(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check and time link classification")
+    parser.add_argument('--anchors', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help="anchors per synthetic page")
+    parser.add_argument('--repeat', type=int, default=20, help="timing runs per page")
+    args = parser.parse_args(argv)
+
+    print("Cases:")
+    failures = check_cases()
+
+    print(f"\n{'anchors':>8}{'substring ms':>14}{'classify ms':>13}{'+collect ms':>13}"
+          f"{'internal':>10}{'external':>10}")
+    for count in args.anchors:
+        hrefs = synthetic_hrefs(count)
+        old = best_ms(lambda: substring_count(hrefs, 'www.example.com'), args.repeat)
+        # The host cache is warm after the first run, as it is across a crawl
+        registrable_domain.cache_clear()
+        new = best_ms(lambda: classify_links(hrefs, PAGE), args.repeat)
+        collect = best_ms(lambda: classify_links(hrefs, PAGE, collect=True), args.repeat)
+        internal, external, _ = classify_links(hrefs, PAGE)
+        print(f"{count:>8}{old:>14.2f}{new:>13.2f}{collect:>13.2f}{internal:>10}{external:>10}")
+
+    if failures:
+        print(f"\n{failures} case(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Link classification for scraped pages.
+
+A link is internal when its host has the same registrable domain as the
+page ('blog.example.com' and 'www.example.com' both belong to example.com,
+'notexample.com' does not), which takes a public suffix lookup: the
+registrable domain under 'co.uk' or 'github.io' is one label longer than
+under 'com'. Lookups are cached per host, since a page links to the same
+few hosts over and over.
+
+Relative hrefs are recognized by having neither a colon nor '//' and are
+counted without being parsed or resolved; absolute ones are grouped by
+their authority text, so each host on the page is parsed once however many
+links point to it. Relative links are only resolved when the link set is
+wanted for the frontier, which normalizes them itself.
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+from urllib.parse import urljoin, urlsplit
+
+# Multi-label public suffixes in common use; the default rule makes every
+# other top-level label a public suffix. load_public_suffix_list() replaces
+# this with the full list from https://publicsuffix.org/list/.
+PUBLIC_SUFFIXES = {
+    # Country second-level domains
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'me.uk', 'net.uk', 'ltd.uk', 'plc.uk', 'nhs.uk',
+    'com.au', 'net.au', 'org.au', 'edu.au', 'gov.au', 'asn.au', 'id.au',
+    'co.in', 'net.in', 'org.in', 'firm.in', 'gen.in', 'ind.in', 'ac.in', 'edu.in', 'res.in',
+    'gov.in', 'mil.in', 'nic.in',
+    'co.jp', 'ne.jp', 'or.jp', 'ac.jp', 'go.jp', 'ed.jp', 'gr.jp', 'lg.jp',
+    'co.nz', 'net.nz', 'org.nz', 'govt.nz', 'ac.nz', 'school.nz',
+    'co.za', 'org.za', 'gov.za', 'ac.za', 'web.za',
+    'com.br', 'net.br', 'org.br', 'gov.br', 'edu.br',
+    'com.cn', 'net.cn', 'org.cn', 'gov.cn', 'edu.cn', 'ac.cn',
+    'com.hk', 'org.hk', 'gov.hk', 'edu.hk', 'com.tw', 'org.tw', 'gov.tw', 'edu.tw',
+    'co.kr', 'or.kr', 'go.kr', 'ac.kr', 'com.sg', 'org.sg', 'gov.sg', 'edu.sg',
+    'com.my', 'gov.my', 'edu.my', 'co.id', 'or.id', 'go.id', 'ac.id', 'co.th', 'ac.th',
+    'go.th', 'com.ph', 'gov.ph', 'com.vn', 'gov.vn', 'com.pk', 'gov.pk', 'edu.pk',
+    'com.bd', 'gov.bd', 'com.np', 'gov.np', 'gov.lk', 'com.lk',
+    'com.sa', 'gov.sa', 'com.eg', 'gov.eg', 'co.il', 'org.il', 'gov.il', 'ac.il',
+    'com.tr', 'gov.tr', 'edu.tr', 'co.ke', 'or.ke', 'go.ke', 'com.ng', 'gov.ng', 'edu.ng',
+    'com.mx', 'gob.mx', 'edu.mx', 'com.ar', 'gob.ar', 'com.co', 'gov.co', 'com.pe', 'gob.pe',
+    'co.ve', 'gob.ve', 'com.ua', 'gov.ua', 'co.at', 'or.at', 'gv.at', 'ac.at',
+    # Hosting platforms whose subdomains belong to different owners
+    'blogspot.com', 'github.io', 'gitlab.io', 'herokuapp.com', 'appspot.com',
+    'netlify.app', 'vercel.app', 'pages.dev', 'workers.dev', 'azurewebsites.net',
+    'cloudfront.net', 'web.app', 'firebaseapp.com', 'wordpress.com', 'substack.com',
+}
+# '*.ck'-style rules (every label under the suffix is public) and '!www.ck'
+# exceptions to them
+WILDCARD_SUFFIXES = set()
+EXCEPTION_SUFFIXES = set()
+
+WEB_SCHEMES = frozenset(['http', 'https'])
+# Hrefs whose host follows right after the prefix
+HOST_PREFIXES = ('https://', 'http://', '//')
+SCHEME_RE = re.compile(r'([A-Za-z][A-Za-z0-9+.-]*):')
+# An href with a scheme or a '//' authority; everything else is relative
+ABSOLUTE_RE = re.compile(r'\s*(?:[A-Za-z][A-Za-z0-9+.-]*:|//)')
+_AUTHORITY_END = ('/', '?', '#', '\\')
+
+
+def load_public_suffix_list(path):
+    """Replace the built-in suffixes with a public_suffix_list.dat file"""
+    suffixes, wildcards, exceptions = set(), set(), set()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            rule = line.split(None, 1)[0] if line.strip() else ''
+            if not rule or rule.startswith('//'):
+                continue
+            rule = rule.lower()
+            if rule.startswith('!'):
+                exceptions.add(rule[1:])
+            elif rule.startswith('*.'):
+                wildcards.add(rule[2:])
+            else:
+                suffixes.add(rule)
+    PUBLIC_SUFFIXES.clear()
+    PUBLIC_SUFFIXES.update(suffixes)
+    WILDCARD_SUFFIXES.clear()
+    WILDCARD_SUFFIXES.update(wildcards)
+    EXCEPTION_SUFFIXES.clear()
+    EXCEPTION_SUFFIXES.update(exceptions)
+    registrable_domain.cache_clear()
+
+
+@lru_cache(maxsize=65536)
+def registrable_domain(host):
+    """
+    The registrable domain of a lower-case host (public suffix plus one
+    label): 'news.bbc.co.uk' -> 'bbc.co.uk'. IP addresses, single-label
+    hosts and public suffixes themselves come back unchanged.
+    """
+    if not host or ':' in host or host.replace('.', '').isdigit():
+        return host  # IPv6 or IPv4 literal
+    labels = host.split('.')
+    # Longest rule first: the first suffix that is public decides
+    for i in range(1, len(labels)):
+        suffix = '.'.join(labels[i:])
+        if suffix in EXCEPTION_SUFFIXES:
+            return suffix
+        if suffix in PUBLIC_SUFFIXES or labels[i + 1:] and '.'.join(labels[i + 1:]) in WILDCARD_SUFFIXES:
+            return '.'.join(labels[i - 1:])
+    # Default rule: the top-level label is the public suffix
+    return '.'.join(labels[-2:]) if len(labels) > 1 else host
+
+
+def link_host(href):
+    """
+    Lower-case host of an absolute or protocol-relative href; '' for a
+    relative link and None for a non-web scheme (mailto:, javascript:, ...)
+    """
+    if href.startswith('//'):
+        start = 2
+    else:
+        match = SCHEME_RE.match(href)
+        if match is None:
+            return ''  # No scheme, or a colon later on as in 'page?t=1:2'
+        if match.group(1).lower() not in WEB_SCHEMES:
+            return None
+        # Browsers accept any number of slashes (and backslashes) here
+        start = match.end()
+        while start < len(href) and href[start] in '/\\':
+            start += 1
+
+    end = len(href)
+    for char in _AUTHORITY_END:
+        position = href.find(char, start)
+        if position != -1 and position < end:
+            end = position
+    host = href[start:end].rpartition('@')[2]
+    if host.startswith('['):
+        return host[:host.find(']') + 1].lower()
+    return host.partition(':')[0].rstrip('.').lower()
+
+
+def classify_links(hrefs, page_url, base_url=None, collect=False):
+    """
+    Count the internal and external web links among hrefs of the page at
+    page_url; non-web links (mailto:, tel:, javascript:) count as neither.
+    base_url (from <base href>) is only where relative links point.
+    Returns (internal, external, links), links being the deduplicated
+    absolute URLs in page order when collect is set, else None; they are
+    left for the frontier to normalize.
+    """
+    page_domain = registrable_domain(urlsplit(page_url).hostname or '')
+    base_url = base_url or page_url
+    # Relative links go wherever <base href> points, normally the page's site
+    relative_internal = (base_url == page_url
+                         or registrable_domain(urlsplit(base_url).hostname or '') == page_domain)
+
+    # Relative links are most of a page: anything without a colon or '//'
+    # is one, and is counted without being looked at further
+    candidates = [href for href in hrefs if ':' in href or '//' in href]
+    relative = len(hrefs) - len(candidates)
+    internal, external = (relative, 0) if relative_internal else (0, relative)
+
+    # http(s) and protocol-relative links are counted per authority (the
+    # text between '//' and the next '/'), so each host is only parsed once
+    authorities = Counter([href.split('/', 3)[2] for href in candidates
+                           if href.startswith(HOST_PREFIXES)])
+    others = []
+    if not all(authority.strip('\\') for authority in authorities):
+        # 'https:///host' and the like: the host is further on
+        others = [href for href in candidates if href.startswith(HOST_PREFIXES)
+                  and not href.split('/', 3)[2].strip('\\')]
+        authorities = Counter({authority: count for authority, count in authorities.items()
+                               if authority.strip('\\')})
+    for authority, count in authorities.items():
+        if registrable_domain(link_host('http://' + authority)) == page_domain:
+            internal += count
+        else:
+            external += count
+
+    # Other schemes (mostly the same few mailto: links), upper-case ones and
+    # relative links with a colon later on as in '?t=10:30'
+    others += [href for href in candidates if not href.startswith(HOST_PREFIXES)]
+    for href, count in Counter(others).items():
+        host = link_host(href.strip())
+        if host is None:
+            continue
+        if host:
+            is_internal = registrable_domain(host) == page_domain
+        else:
+            is_internal = relative_internal
+        if is_internal:
+            internal += count
+        else:
+            external += count
+
+    return internal, external, collect_links(hrefs, base_url) if collect else None
+
+
+def collect_links(hrefs, base_url):
+    """Deduplicated absolute web URLs of hrefs in page order, relative ones
+    resolved against base_url"""
+    origin = '{0.scheme}://{0.netloc}'.format(urlsplit(base_url))
+    links = {}
+    seen = set()
+    for href in hrefs:
+        if href in seen:
+            continue
+        seen.add(href)
+        href = href.strip()
+        if not ABSOLUTE_RE.match(href):
+            if href.startswith('/') and '/.' not in href:
+                links[origin + href] = None  # Same result as urljoin, without it
+            else:
+                links[urljoin(base_url, href)] = None
+            continue
+        host = link_host(href)
+        if host is None:
+            continue
+        links[href if host and not href.startswith('//') else urljoin(base_url, href)] = None
+    return list(links)
+
+
+def resolve_base(page_url, base_href=None):
+    """URL the page's relative links resolve against: <base href> if present"""
+    return urljoin(page_url, base_href.strip()) if base_href else page_url
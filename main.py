@@ -1,3 +1,10 @@
-import  pandas as pd
+def read_table(url, index=0, selector=None, match=None):
+    """Return the index-th HTML table found at url (or in an HTML string/file) as a DataFrame;
+    only that table is parsed and the download stops once it has been read"""
+    # Imported on first use: pandas takes most of this script's startup time
+    from table_extract import read_table as extract_table
+    
+    return extract_table(url, index=index, selector=selector, match=match)
 
-pd.read_html("https://en.wikipedia.org/wiki/List_of_highest-grossing_films")[0] # Replace URL
+if __name__ == "__main__":
+    print(read_table("https://en.wikipedia.org/wiki/List_of_highest-grossing_films")) # Replace URL
@@ -0,0 +1,413 @@
+"""
+Stage timers, counters and profiling hooks for the scrapers.
+
+Code records into the shared METRICS registry:
+
+    with METRICS.timer('parse'):
+        soup = make_soup(html)
+    METRICS.inc('http_responses_total', status='200')
+
+The registry renders the Prometheus text format, either to a file (for the
+node_exporter textfile collector or just for reading) or over HTTP via
+serve(). profile() turns on cProfile or pyinstrument for chosen stages,
+and dump_profiles() writes what they collected.
+
+instrument_session() splits each requests.Session request into connection
+setup (DNS lookup and connect together), TLS, time-to-first-byte and
+download phases; aiohttp_trace_config() does the same for aiohttp
+sessions, whose trace hooks also time the DNS lookup on its own.
+"""
+import bisect
+import cProfile
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+PREFIX = 'scraper_'
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    'stage_seconds': 'Time spent in each scraper stage',
+    'http_phase_seconds': 'Time spent in each phase of an HTTP request',
+    'http_responses_total': 'HTTP responses by status code',
+    'http_errors_total': 'HTTP requests that failed without a response',
+    'http_response_bytes_total': 'Bytes of response bodies downloaded',
+    'fetch_retries_total': 'Fetch attempts that were retried',
+    'fetch_failures_total': 'Pages given up on after all retries',
+    'cache_requests_total': 'HTTP cache lookups by result',
+    'selectors_tried_total': 'CSS selectors evaluated per field',
+    'selector_hits_total': 'Fields found, by learned shortcut or ordered scan',
+    'selector_misses_total': 'Fields no selector matched',
+    'pages_total': 'Pages scraped by outcome',
+    'articles_total': 'Articles extracted',
+    'duplicates_total': 'Records dropped or linked as duplicates, by exact or near match',
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Timer:
+    """Context manager timing one stage (and profiling it when enabled)"""
+
+    __slots__ = ('metrics', 'stage', 'labels', 'started', 'profiler')
+
+    def __init__(self, metrics, stage, labels):
+        self.metrics = metrics
+        self.stage = stage
+        self.labels = labels
+        self.profiler = None
+
+    def __enter__(self):
+        profiler = self.metrics.profilers.get(self.stage)
+        if profiler is not None:
+            self.profiler = self.metrics._start_profiler(profiler)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        if self.profiler is not None:
+            self.metrics._stop_profiler(self.stage, self.profiler)
+        self.metrics.observe('stage_seconds', elapsed, stage=self.stage, **self.labels)
+        return False
+
+
+class Metrics:
+    """Thread-safe registry of counters and histograms"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.profilers = {}   # stage -> cProfile.Profile or pyinstrument Profiler
+        self.lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """Add value to a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Record one value (usually seconds) in a histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def timer(self, stage, **labels):
+        """Context manager recording the duration of a stage"""
+        return _Timer(self, stage, labels)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def drain(self):
+        """Return everything recorded so far as plain data and start over;
+        worker processes send this back to be merged into the parent"""
+        with self.lock:
+            state = (dict(self.counters),
+                     {key: (histogram.counts, histogram.sum, histogram.count)
+                      for key, histogram in self.histograms.items()})
+            self.counters.clear()
+            self.histograms.clear()
+        return state
+
+    def merge(self, state):
+        """Add counters and histograms returned by drain()"""
+        counters, histograms = state
+        with self.lock:
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, (counts, total, count) in histograms.items():
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram(self.buckets)
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.sum += total
+                histogram.count += count
+
+    # Profiling hooks
+    def profile(self, stages, tool='cprofile'):
+        """Profile every run of the given stages with cProfile or pyinstrument"""
+        for stage in stages:
+            if tool == 'pyinstrument':
+                from pyinstrument import Profiler
+                self.profilers[stage] = Profiler(async_mode='disabled')
+            else:
+                self.profilers[stage] = cProfile.Profile()
+
+    def _start_profiler(self, profiler):
+        # Only one profiler can run per thread; nested or concurrent stages
+        # are timed but not profiled
+        try:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.enable()
+            else:
+                profiler.start()
+        except (ValueError, RuntimeError):
+            return None
+        return profiler
+
+    def _stop_profiler(self, stage, profiler):
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+        else:
+            profiler.stop()
+
+    def dump_profiles(self, directory="profiles"):
+        """Write one profile per stage: <stage>.prof for cProfile (open with
+        pstats or snakeviz), <stage>.txt for pyinstrument"""
+        os.makedirs(directory, exist_ok=True)
+        for stage, profiler in self.profilers.items():
+            if isinstance(profiler, cProfile.Profile):
+                profiler.dump_stats(os.path.join(directory, f'{stage}.prof'))
+            elif profiler.last_session is not None:
+                with open(os.path.join(directory, f'{stage}.txt'), 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_text())
+
+    # Export
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (list(h.counts), h.sum, h.count))
+                                for key, h in self.histograms.items())
+
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in METRIC_HELP:
+                    lines.append(f'# HELP {PREFIX}{name} {METRIC_HELP[name]}')
+                lines.append(f'# TYPE {PREFIX}{name} {kind}')
+
+        for (name, labels), value in counters:
+            describe(name, 'counter')
+            lines.append(f'{PREFIX}{name}{_label_text(labels)} {value}')
+
+        for (name, labels), (counts, total, count) in histograms:
+            describe(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{PREFIX}{name}_bucket{_label_text(labels + (("le", le),))} {cumulative}')
+            lines.append(f'{PREFIX}{name}_sum{_label_text(labels)} {total}')
+            lines.append(f'{PREFIX}{name}_count{_label_text(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """Write render() to path atomically"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port=9108, address='127.0.0.1'):
+        """Expose /metrics over HTTP from a background thread; returns the server"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((address, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+# Registry shared by all scraper modules
+METRICS = Metrics()
+
+
+def timed(stage):
+    """Decorator recording every call of a function as a stage in METRICS"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with METRICS.timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# requests instrumentation: connection setup times are collected per thread
+# while a request is being sent
+_phases = threading.local()
+
+
+class _TimedSetup:
+    def _new_conn(self):
+        # DNS lookup and connect together, however urllib3 goes about them
+        started = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            _phases.dns_connect = time.perf_counter() - started
+
+
+class TimedHTTPConnection(_TimedSetup, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedSetup, HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        # Whatever the socket setup did not account for is the TLS handshake
+        _phases.tls = max(0.0, time.perf_counter() - started - getattr(_phases, 'dns_connect', 0.0))
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+TIMED_POOL_CLASSES = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+
+class TimedAdapter(HTTPAdapter):
+    """HTTPAdapter recording connection setup/TLS/TTFB/download times, bytes
+    and status codes for every request"""
+
+    def __init__(self, metrics=None, **kwargs):
+        self.metrics = metrics or METRICS
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        # Same pools, only with timed connections
+        self.poolmanager.pool_classes_by_scheme = dict(
+            self.poolmanager.pool_classes_by_scheme, **TIMED_POOL_CLASSES)
+
+    def send(self, request, stream=False, **kwargs):
+        _phases.__dict__.clear()
+        started = time.perf_counter()
+        try:
+            response = super().send(request, stream=stream, **kwargs)
+        except requests.exceptions.RequestException as e:
+            self.metrics.inc('http_errors_total', error=type(e).__name__)
+            raise
+        headers_at = time.perf_counter()
+
+        setup = 0.0
+        for phase in ('dns_connect', 'tls'):
+            value = getattr(_phases, phase, None)
+            if value is not None:
+                self.metrics.observe('http_phase_seconds', value, phase=phase)
+                setup += value
+        self.metrics.observe('http_phase_seconds', max(0.0, headers_at - started - setup), phase='ttfb')
+        self.metrics.inc('http_responses_total', status=str(response.status_code))
+
+        if not stream:
+            # Read the body here so the download can be timed on its own
+            size = len(response.content)
+            self.metrics.observe('http_phase_seconds', time.perf_counter() - headers_at, phase='download')
+            self.metrics.inc('http_response_bytes_total', size)
+        return response
+
+
+def instrument_session(session, metrics=None):
+    """Mount timing adapters on a requests.Session and return it"""
+    adapter = TimedAdapter(metrics)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def aiohttp_trace_config(metrics=None):
+    """aiohttp.TraceConfig recording DNS, connect and TTFB times"""
+    import aiohttp
+
+    metrics = metrics or METRICS
+    trace = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params):
+        context.started = time.perf_counter()
+        context.setup = 0.0
+
+    async def on_dns_resolvehost_start(session, context, params):
+        context.dns_started = time.perf_counter()
+
+    async def on_dns_resolvehost_end(session, context, params):
+        elapsed = time.perf_counter() - context.dns_started
+        context.dns = elapsed
+        metrics.observe('http_phase_seconds', elapsed, phase='dns')
+
+    async def on_connection_create_start(session, context, params):
+        context.connect_started = time.perf_counter()
+        context.dns = 0.0
+
+    async def on_connection_create_end(session, context, params):
+        # aiohttp resolves inside connection creation; report the rest as connect
+        elapsed = time.perf_counter() - context.connect_started
+        metrics.observe('http_phase_seconds', max(0.0, elapsed - context.dns), phase='connect')
+        context.setup = elapsed
+
+    async def on_request_end(session, context, params):
+        elapsed = time.perf_counter() - context.started - context.setup
+        metrics.observe('http_phase_seconds', max(0.0, elapsed), phase='ttfb')
+        metrics.inc('http_responses_total', status=str(params.response.status))
+
+    async def on_request_exception(session, context, params):
+        metrics.inc('http_errors_total', error=type(params.exception).__name__)
+
+    trace.on_request_start.append(on_request_start)
+    trace.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace.on_connection_create_start.append(on_connection_create_start)
+    trace.on_connection_create_end.append(on_connection_create_end)
+    trace.on_request_end.append(on_request_end)
+    trace.on_request_exception.append(on_request_exception)
+    return trace
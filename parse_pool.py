@@ -0,0 +1,112 @@
+"""
+Process-pool parsing stage that runs decoupled from network I/O.
+
+The fetch stage puts raw responses on a bounded queue; worker processes parse
+them in chunks. When the parsers fall behind the queue fills up and the
+fetcher blocks, so memory stays bounded no matter how many URLs are queued.
+"""
+import asyncio
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import METRICS
+
+# Marks the end of the fetch stage on the queue
+_DONE = object()
+
+
+def _parse_chunk(parse_func, chunk):
+    """Parse a chunk of fetched items inside a worker process; returns the
+    results and the metrics recorded while parsing them"""
+    # A forked worker starts with a copy of the parent's metrics
+    METRICS.reset()
+    results = [parse_func(item) for item in chunk]
+    return results, METRICS.drain()
+
+
+def _collect(future):
+    """Results of a parsed chunk, its metrics merged into this process's"""
+    results, metrics = future.result()
+    METRICS.merge(metrics)
+    return results
+
+
+class ParsePipeline:
+    """Feed fetched items through a pool of parser processes"""
+
+    def __init__(self, parse_func, workers=None, chunk_size=8, queue_size=256):
+        # parse_func must be a module-level function so it can be pickled
+        self.parse_func = parse_func
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size)
+        self.queue_size = max(1, queue_size)
+
+    def _produce(self, items, fetched, errors):
+        """Fetch stage: move items onto the bounded queue"""
+        try:
+            for item in items:
+                fetched.put(item)  # Blocks while the parsers are behind
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            fetched.put(_DONE)
+
+    def _produce_async(self, async_items, fetched, errors):
+        """Fetch stage for an async iterator such as async_fetch.fetch_iter"""
+        async def pump():
+            loop = asyncio.get_running_loop()
+            async for item in async_items:
+                # Block in a helper thread so in-flight downloads keep running
+                await loop.run_in_executor(None, fetched.put, item)
+
+        try:
+            asyncio.run(pump())
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            fetched.put(_DONE)
+
+    def _chunks(self, fetched):
+        """Group queued items into chunks for the workers"""
+        chunk = []
+        while True:
+            item = fetched.get()
+            if item is _DONE:
+                break
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def run(self, items):
+        """Parse items (an iterable or async iterable) and yield results in order"""
+        fetched = queue.Queue(maxsize=self.queue_size)
+        errors = []
+
+        if hasattr(items, '__aiter__'):
+            target = self._produce_async
+        else:
+            target = self._produce
+        producer = threading.Thread(target=target, args=(items, fetched, errors), daemon=True)
+        producer.start()
+
+        # Keep only a few chunks per worker in flight
+        max_in_flight = self.workers * 2
+        in_flight = []
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for chunk in self._chunks(fetched):
+                in_flight.append(executor.submit(_parse_chunk, self.parse_func, chunk))
+                if len(in_flight) >= max_in_flight:
+                    yield from _collect(in_flight.pop(0))
+
+            for future in in_flight:
+                yield from _collect(future)
+
+        producer.join()
+        if errors:
+            raise errors[0]
@@ -0,0 +1,67 @@
+"""
+Checks that every installed parser backend extracts identical records from
+the saved HTML fixtures.
+
+Run with: python parser_equivalence.py [fixture.html ...]
+"""
+import glob
+import os
+import sys
+
+from extractor import extract_markup
+from parsers import PAGE_BACKENDS, SOUP_BACKENDS, available_backends, make_soup
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# html.parser is always installed, so it serves as the reference
+REFERENCE = 'html.parser'
+
+
+def page_records(markup):
+    """Page fields (htmlfile_scrap) per backend"""
+    return {backend: extract_markup(markup, backend)
+            for backend in available_backends(PAGE_BACKENDS)}
+
+
+def article_records(markup):
+    """Article records (SimpleKudlaScraper) per BeautifulSoup backend"""
+    from http_gateway import SimpleKudlaScraper
+
+    scraper = SimpleKudlaScraper()
+    records = {}
+    for backend in available_backends(SOUP_BACKENDS):
+        records[backend] = scraper.extract_articles(make_soup(markup, backend))
+    return records
+
+
+def compare(name, kind, records):
+    """Print mismatches against the reference backend; return True if all match"""
+    expected = records[REFERENCE]
+    ok = True
+    for backend, result in records.items():
+        if result != expected:
+            ok = False
+            print(f"MISMATCH {name} [{kind}] {backend} differs from {REFERENCE}")
+            print(f"  {REFERENCE}: {expected!r:.300}")
+            print(f"  {backend}: {result!r:.300}")
+    return ok
+
+
+def main(paths=None):
+    paths = paths or sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html')))
+    print(f"Backends: {', '.join(available_backends(PAGE_BACKENDS))}")
+
+    ok = True
+    for path in paths:
+        with open(path, 'rb') as f:
+            markup = f.read()
+        name = os.path.basename(path)
+        page_ok = compare(name, 'page', page_records(markup))
+        articles_ok = compare(name, 'articles', article_records(markup))
+        print(f"{'ok  ' if page_ok and articles_ok else 'FAIL'} {name}")
+        ok = ok and page_ok and articles_ok
+
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,97 @@
+"""
+HTML parser backend selection shared by all scrapers.
+
+BeautifulSoup-based code gets the fastest installed tree builder (lxml, then
+html.parser). The page extractor in htmlfile_scrap can additionally use the
+selectolax/lexbor engine, which does not build a BeautifulSoup tree at all.
+"""
+import codecs
+from functools import lru_cache
+import importlib.util
+import re
+
+# Fastest first; html.parser ships with Python and is always available
+SOUP_BACKENDS = ('lxml', 'html.parser')
+PAGE_BACKENDS = ('selectolax',) + SOUP_BACKENDS
+
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+@lru_cache(maxsize=None)
+def is_installed(backend):
+    """Whether the module behind a backend can be imported"""
+    if backend == 'html.parser':
+        return True
+    return importlib.util.find_spec(backend) is not None
+
+
+def available_backends(candidates=PAGE_BACKENDS):
+    """Return the installed backends among candidates, fastest first"""
+    return [backend for backend in candidates if is_installed(backend)]
+
+
+def soup_backend(backend=None):
+    """Pick the BeautifulSoup tree builder to use"""
+    if backend is None:
+        return available_backends(SOUP_BACKENDS)[0]
+    if backend not in SOUP_BACKENDS:
+        raise ValueError(f"Unknown BeautifulSoup backend: {backend!r}")
+    if not is_installed(backend):
+        raise ImportError(f"Parser backend {backend!r} is not installed")
+    return backend
+
+
+def page_backend(backend=None):
+    """Pick the backend for page extraction (may be selectolax)"""
+    if backend is None:
+        return available_backends(PAGE_BACKENDS)[0]
+    if backend == 'selectolax':
+        if not is_installed(backend):
+            raise ImportError("Parser backend 'selectolax' is not installed")
+        return backend
+    return soup_backend(backend)
+
+
+def make_soup(markup, backend=None, encoding=None):
+    """Parse markup (str or bytes) into a BeautifulSoup tree"""
+    # Imported on first use; the selectolax path never needs bs4
+    from bs4 import BeautifulSoup
+
+    features = soup_backend(backend)
+    if isinstance(markup, bytes):
+        return BeautifulSoup(markup, features, from_encoding=encoding)
+    return BeautifulSoup(markup, features)
+
+
+def declared_encoding(response):
+    """
+    The charset a requests response declared in its Content-Type, or None.
+    requests assumes ISO-8859-1 for text/* without a charset; parsers given
+    the raw bytes do better sniffing the document themselves.
+    """
+    if 'charset' in response.headers.get('Content-Type', '').lower():
+        return response.encoding
+    return None
+
+
+def is_utf8(markup, encoding=None):
+    """
+    Whether bytes markup can go as is to a parser that only reads UTF-8:
+    declared UTF-8 (by the server, else by a <meta charset>) or plain ASCII
+    """
+    if markup.startswith(codecs.BOM_UTF8):
+        return False  # Decoding strips the BOM, the parser would not
+    if encoding is None:
+        declared = META_CHARSET_RE.search(markup, 0, 4096)
+        if declared is None:
+            return markup.isascii()
+        encoding = declared.group(1).decode('ascii')
+    try:
+        return codecs.lookup(encoding).name == 'utf-8'
+    except LookupError:
+        return False
+
+
+def read_html_flavor():
+    """Parser flavor for pandas.read_html: lxml when installed, else bs4"""
+    return 'lxml' if is_installed('lxml') else 'bs4'
@@ -0,0 +1,127 @@
+"""
+Adaptive per-host politeness scheduler.
+
+Each host gets a token bucket whose refill rate adapts to how the server is
+doing: it creeps up while responses are fast and healthy, drops on slow
+responses, and is cut in half on 429/503. Retry-After and exponential
+backoff with full jitter pause only the affected host, so requests to other
+hosts keep flowing. Safe to share between threads and asyncio tasks.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Responses that mean "slow down"
+THROTTLE_STATUSES = frozenset([429, 503])
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_transient(status):
+    """Whether a request that ended in status (None: no response at all) may
+    succeed when retried; a 404 or 410 will not"""
+    return status is None or status in THROTTLE_STATUSES or status >= 500
+
+
+class HostState:
+    """Token bucket and backoff state for one host"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate            # Tokens (requests) per second
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0     # Monotonic time before which nothing is sent
+        self.failures = 0           # Consecutive failures, drives the backoff
+
+
+class HostScheduler:
+    """Token-bucket rate limiter per host that adapts to server feedback"""
+
+    def __init__(self, min_rate=0.05, max_rate=2.0, initial_rate=0.5, burst=1,
+                 target_latency=2.0, backoff_base=1.0, max_backoff=300.0):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.initial_rate = min(max(initial_rate, min_rate), max_rate)
+        self.burst = burst
+        self.target_latency = target_latency
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def _state(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = HostState(self.initial_rate, self.burst)
+        return state
+
+    def reserve(self, host):
+        """Take a token for host and return how many seconds to wait before
+        sending; does not sleep, so asyncio callers can await the delay"""
+        with self.lock:
+            state = self._state(host)
+            now = time.monotonic()
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+            state.updated = now
+
+            # Tokens may go negative: that is a reservation further in the future
+            state.tokens -= 1
+            wait = 0.0 if state.tokens >= 0 else -state.tokens / state.rate
+            return max(wait, state.paused_until - now)
+
+    def acquire(self, host):
+        """Block until a request to host may be sent"""
+        delay = self.reserve(host)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def backoff(self, failures):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.max_backoff, self.backoff_base * 2 ** failures))
+
+    def record(self, host, status=None, latency=None, retry_after=None):
+        """Feed back the outcome of a request (status None means it failed)"""
+        with self.lock:
+            state = self._state(host)
+            now = time.monotonic()
+
+            if status in THROTTLE_STATUSES:
+                # Multiplicative decrease, and honour Retry-After when present
+                state.rate = max(self.min_rate, state.rate / 2)
+                state.failures += 1
+                pause = parse_retry_after(retry_after)
+                if pause is None:
+                    pause = self.backoff(state.failures)
+                state.paused_until = max(state.paused_until, now + pause)
+            elif status is None or status >= 500 or status in (403, 409):
+                state.rate = max(self.min_rate, state.rate * 0.75)
+                state.failures += 1
+                state.paused_until = max(state.paused_until, now + self.backoff(state.failures))
+            else:
+                state.failures = 0
+                if latency is not None and latency > self.target_latency:
+                    # Server is struggling: slow down in proportion
+                    state.rate = max(self.min_rate, state.rate * self.target_latency / latency)
+                else:
+                    # Additive increase while the host is healthy
+                    state.rate = min(self.max_rate, state.rate + self.min_rate)
+
+    def pause_remaining(self, host):
+        """Seconds until host may be contacted again"""
+        with self.lock:
+            return max(0.0, self._state(host).paused_until - time.monotonic())
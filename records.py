@@ -0,0 +1,107 @@
+"""
+Record types for scraped pages and listing articles.
+
+Both are slotted dataclasses: no per-instance __dict__, so a crawl holding
+hundreds of thousands of records in memory needs a fraction of the space
+dicts took. They still read like the dicts they replace (record['url'],
+record.get('excerpt'), keys(), items()), so sinks, the dedup index and the
+crawl state take either.
+"""
+import enum
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import ClassVar, Optional
+
+
+class _Unset(enum.Enum):
+    # Enum members survive pickling (records cross the parse pool) as themselves
+    UNSET = 0
+
+
+# duplicate_of is only a column when a dedup index in link mode set it
+_UNSET = _Unset.UNSET
+
+
+class Record:
+    """Read-only mapping access to a record's output columns"""
+
+    __slots__ = ()
+    FIELDS: ClassVar[tuple] = ()
+
+    def keys(self):
+        return self.FIELDS
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def get(self, key, default=None):
+        if key not in self.FIELDS:
+            return default
+        return getattr(self, key)
+
+    def items(self):
+        return ((key, getattr(self, key)) for key in self.FIELDS)
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+
+@dataclass(slots=True)
+class PageRecord(Record):
+    """One scraped page (htmlfile_scrap)"""
+
+    FIELDS: ClassVar[tuple] = (
+        'date', 'time', 'url', 'domain', 'title',
+        'meta_description', 'content', 'word_count',
+        'internal_links_count', 'external_links_count',
+    )
+
+    date: str
+    time: str
+    url: str
+    domain: str
+    title: str
+    meta_description: str
+    content: str
+    internal_links_count: int
+    external_links_count: int
+    # Computed from content on first use; error records pass 0
+    _word_count: Optional[int] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        # A crawl sees the same few domains over and over
+        self.domain = sys.intern(self.domain)
+
+    @property
+    def word_count(self):
+        if self._word_count is None:
+            self._word_count = len(self.content.split())
+        return self._word_count
+
+
+@dataclass(slots=True)
+class ArticleRecord(Record):
+    """One article of a listing page (http_gateway)"""
+
+    title: str
+    url: Optional[str]
+    date: Optional[datetime]
+    date_text: Optional[str]
+    excerpt: Optional[str]
+    duplicate_of: object = field(default=_UNSET, repr=False)
+
+    BASE_FIELDS: ClassVar[tuple] = ('title', 'url', 'date', 'date_text', 'excerpt')
+    LINKED_FIELDS: ClassVar[tuple] = BASE_FIELDS + ('duplicate_of',)
+
+    @property
+    def FIELDS(self):
+        return self.BASE_FIELDS if self.duplicate_of is _UNSET else self.LINKED_FIELDS
@@ -0,0 +1,113 @@
+"""
+Precompiled CSS selector plan for SimpleKudlaScraper.
+
+Every selector list is compiled once. For each field the plan remembers
+which selector won on a site and tries that one first on later pages.
+It only trusts the shortcut when none of the higher-priority selectors
+match, so the result is always the one the ordered scan would give.
+"""
+import soupsieve as sv
+
+from metrics import METRICS
+
+CONTAINER_SELECTORS = [
+    '.post', 'article', '.entry', '.news-item', '.card',
+    'div.content > div', 'div.main > div', '.main-content > div',
+    '.post-box', '.article-box'
+]
+
+FIELD_SELECTORS = {
+    'title': ['h2', '.entry-title', '.post-title', 'h3 a', 'h2 a', 'h3', 'h4 a', 'h4', 'a.title'],
+    'url': ['a', 'h2 a', '.entry-title a', '.post-title a', 'h3 a', 'h4 a'],
+    'date': ['.date', '.entry-date', '.post-date', '.time', 'time', '.meta', '.posted-on', '.post-meta'],
+    'excerpt': ['.excerpt', '.entry-summary', '.post-excerpt', '.summary', 'p'],
+}
+
+HEADING_SELECTOR = 'h1, h2, h3, h4, h5'
+
+
+class FieldSelectors:
+    """Ordered, compiled selectors for one field"""
+
+    def __init__(self, selectors):
+        self.selectors = list(selectors)
+        self.compiled = [sv.compile(selector) for selector in self.selectors]
+        # higher[i] matches anything a selector ranked above i would match
+        self.higher = [None] + [sv.compile(', '.join(self.selectors[:i]))
+                                for i in range(1, len(self.selectors))]
+
+
+class SelectorPlan:
+    """Compiled container and field selectors with per-site learned winners"""
+
+    def __init__(self, container_selectors=CONTAINER_SELECTORS, field_selectors=FIELD_SELECTORS):
+        self.containers = [(selector, sv.compile(selector)) for selector in container_selectors]
+        self.fields = {field: FieldSelectors(selectors)
+                       for field, selectors in field_selectors.items()}
+        self.headings = sv.compile(HEADING_SELECTOR)
+        self.learned = {}  # (site, field) -> index of the winning selector
+
+    def iter_containers(self, soup, selectors=None):
+        """Yield (selector, match count, new containers) for every container
+        selector, or only those in selectors (a site profile's); elements an
+        earlier selector already returned are left out"""
+        seen = set()
+        for selector, compiled in self.containers:
+            if selectors is not None and selector not in selectors:
+                continue
+            containers = compiled.select(soup)
+            unique = []
+            for container in containers:
+                if id(container) not in seen:
+                    seen.add(id(container))
+                    unique.append(container)
+            yield selector, len(containers), unique
+
+    def find(self, element, field, site=None, accept=None):
+        """Return (index, element) for the first selector of field, in priority
+        order, whose first match inside element passes accept; else (None, None)"""
+        selectors = self.fields[field]
+        key = (site, field)
+
+        # Fast path: the selector that won last time on this site
+        index = self.learned.get(key)
+        if index is not None:
+            match = selectors.compiled[index].select_one(element)
+            if match is not None and (accept is None or accept(match)):
+                if index == 0 or selectors.higher[index].select_one(element) is None:
+                    METRICS.inc('selectors_tried_total', 1 if index == 0 else 2, field=field)
+                    METRICS.inc('selector_hits_total', field=field, path='learned')
+                    return index, match
+
+        # Ordered scan, exactly as the selectors are listed
+        for index, compiled in enumerate(selectors.compiled):
+            match = compiled.select_one(element)
+            if match is not None and (accept is None or accept(match)):
+                self.learned[key] = index
+                METRICS.inc('selectors_tried_total', index + 1, field=field)
+                METRICS.inc('selector_hits_total', field=field, path='scan')
+                return index, match
+        METRICS.inc('selectors_tried_total', len(selectors.compiled), field=field)
+        METRICS.inc('selector_misses_total', field=field)
+        return None, None
+
+    def winners(self, site):
+        """{field: selector} that won on site so far"""
+        return {field: self.fields[field].selectors[index]
+                for (learned_site, field), index in self.learned.items() if learned_site == site}
+
+    def learn(self, site, winners):
+        """Start from stored winners for site ({field: selector}, as from
+        winners()); selectors that are no longer listed are ignored"""
+        for field, selector in winners.items():
+            selectors = self.fields.get(field)
+            if selectors is not None and selector in selectors.selectors:
+                self.learned[(site, field)] = selectors.selectors.index(selector)
+
+    def select(self, element, field, index, limit=0):
+        """All matches of one selector of field inside element"""
+        return self.fields[field].compiled[index].select(element, limit=limit)
+
+    def first_heading(self, element):
+        """First h1-h5 inside element, or None"""
+        return self.headings.select_one(element)
@@ -0,0 +1,381 @@
+"""
+Streaming result sinks for the scrapers.
+
+Records are written as they are produced and flushed in batches, so memory
+stays flat however long the crawl runs. checkpoint() makes everything written
+so far durable and atomically records a resume position next to the output;
+resume() rolls the output back to the last checkpoint and returns that
+position, so an interrupted run continues without losing or duplicating rows.
+"""
+import csv
+import datetime
+import glob
+import json
+import os
+import sqlite3
+
+# pyarrow is optional and slow to import; it is loaded on first Parquet use
+pa = pq = None
+
+# Low-cardinality columns stored dictionary-encoded in Parquet
+DICTIONARY_COLUMNS = ('domain', 'date')
+
+
+def _load_pyarrow(purpose):
+    global pa, pq
+    if pq is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError(f"pyarrow is required {purpose} (pip install pyarrow)") from None
+        pa, pq = pyarrow, pyarrow.parquet
+
+
+def serialize(record):
+    """Plain dict for a record (dict or records.Record), with dates as YYYY-MM-DD strings"""
+    row = {}
+    for key, value in record.items():
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            value = value.strftime('%Y-%m-%d')
+        row[key] = value
+    return row
+
+
+def write_json_atomic(path, data):
+    """Replace path with data in one step"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Sink:
+    """Base class: buffers records and writes them in batches"""
+
+    # Records a checkpoint should cover before it is worth taking (see
+    # checkpoint_due); formats where a checkpoint costs a file raise it
+    checkpoint_records = 0
+
+    def __init__(self, path, batch_size=100, mode='a'):
+        self.path = path
+        self.batch_size = batch_size
+        self.mode = mode
+        self.checkpoint_path = path + '.checkpoint'
+        self.buffer = []
+        self.written = 0
+        self.checkpointed = 0  # written at the last checkpoint
+
+        # A fresh (non-resumed) run must not inherit an old checkpoint
+        if mode == 'w' and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def write(self, record):
+        """Queue a record; a full batch is written out immediately"""
+        self.buffer.append(serialize(record))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered records"""
+        if self.buffer:
+            self._write_batch(self.buffer)
+            self.written += len(self.buffer)
+            self.buffer = []
+
+    def checkpoint_due(self):
+        """Whether enough records came in since the last checkpoint for the
+        next one; callers checkpointing on a schedule skip it otherwise"""
+        return self.written + len(self.buffer) - self.checkpointed >= self.checkpoint_records
+
+    def checkpoint(self, position):
+        """Make all records durable and remember position (any JSON value)"""
+        self.flush()
+        marker = self._sync()
+        self.checkpointed = self.written
+        # The one before is kept, so sinks written side by side can agree on
+        # a checkpoint when a crash came between theirs (resume_sinks)
+        previous = self.checkpoints()[:1]
+        write_json_atomic(self.checkpoint_path, {
+            'position': position,
+            'written': self.written,
+            'marker': marker,
+            'previous': previous[0] if previous else None,
+        })
+
+    def checkpoints(self):
+        """The last checkpoint and the one before it (newest first), as dicts
+        with position, written and marker"""
+        if not os.path.exists(self.checkpoint_path):
+            return []
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        previous = checkpoint.pop('previous', None)
+        return [checkpoint] + ([previous] if previous else [])
+
+    def resume(self, checkpoint=None):
+        """Roll the output back to checkpoint (default: the last one) and
+        return its position (None if there is nothing to resume)"""
+        if checkpoint is None:
+            checkpoints = self.checkpoints()
+            if not checkpoints:
+                return None
+            checkpoint = checkpoints[0]
+        self._truncate(checkpoint['marker'])
+        self.written = self.checkpointed = checkpoint['written']
+        return checkpoint['position']
+
+    def close(self, completed=True):
+        """Flush and close; a completed run no longer needs its checkpoint"""
+        self.flush()
+        self._close()
+        if completed and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Keep the checkpoint when the run died so it can be resumed
+        self.close(completed=exc_type is None)
+
+    # Format-specific hooks
+    def _write_batch(self, rows):
+        raise NotImplementedError
+
+    def _sync(self):
+        """Make written rows durable and return a marker to truncate back to"""
+        raise NotImplementedError
+
+    def _truncate(self, marker):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+
+class FileSink(Sink):
+    """Sink writing to an append-only text file; the marker is its size"""
+
+    def __init__(self, path, batch_size=100, mode='a'):
+        super().__init__(path, batch_size, mode)
+        self.file = open(path, mode, newline='', encoding='utf-8')
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def _truncate(self, marker):
+        self.file.flush()
+        self.file.truncate(marker)
+        self.file.seek(marker)
+
+    def _close(self):
+        self.file.close()
+
+
+class CsvSink(FileSink):
+    """CSV output; the header is written when the file starts empty"""
+
+    def __init__(self, path, fieldnames=None, batch_size=100, mode='a'):
+        super().__init__(path, batch_size, mode)
+        self.fieldnames = list(fieldnames) if fieldnames else None
+        self.writer = None
+
+    def _write_batch(self, rows):
+        if self.writer is None:
+            if self.fieldnames is None:
+                self.fieldnames = list(rows[0].keys())
+            self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames, extrasaction='ignore')
+            if self.file.tell() == 0:
+                self.writer.writeheader()
+        self.writer.writerows(rows)
+
+
+class JsonLinesSink(FileSink):
+    """One JSON object per line"""
+
+    def _write_batch(self, rows):
+        self.file.write(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows))
+
+
+class SQLiteSink(Sink):
+    """Rows in a SQLite table; the marker is the last committed rowid"""
+
+    def __init__(self, path, table='records', batch_size=100, mode='a'):
+        super().__init__(path, batch_size, mode)
+        self.table = table
+        self.columns = None
+        self.db = sqlite3.connect(path)
+        if mode == 'w':
+            self.db.execute(f'DROP TABLE IF EXISTS "{table}"')
+            self.db.commit()
+        existing = self.db.execute(f'PRAGMA table_info("{table}")').fetchall()
+        if existing:
+            self.columns = [row[1] for row in existing]
+
+    def _write_batch(self, rows):
+        if self.columns is None:
+            self.columns = list(rows[0].keys())
+            column_list = ', '.join(f'"{column}"' for column in self.columns)
+            self.db.execute(f'CREATE TABLE IF NOT EXISTS "{self.table}" ({column_list})')
+        placeholders = ', '.join('?' for _ in self.columns)
+        self.db.executemany(
+            f'INSERT INTO "{self.table}" VALUES ({placeholders})',
+            [[row.get(column) for column in self.columns] for row in rows])
+        self.db.commit()
+
+    def _sync(self):
+        if self.columns is None:
+            return 0
+        return self.db.execute(f'SELECT COALESCE(MAX(rowid), 0) FROM "{self.table}"').fetchone()[0]
+
+    def _truncate(self, marker):
+        if self.columns is not None:
+            self.db.execute(f'DELETE FROM "{self.table}" WHERE rowid > ?', (marker,))
+            self.db.commit()
+
+    def _close(self):
+        self.db.close()
+
+
+class ParquetSink(Sink):
+    """
+    Parquet dataset: a directory of part files, one row group per batch.
+
+    A part file only gets its footer when it is closed, so every checkpoint
+    finishes the current part and the marker is the number of finished parts.
+    checkpoint_due() holds checkpoints off until a full batch came in, so
+    parts are at least one full row group rather than a file per checkpoint.
+    Parts are written under a .tmp name until finished, so readers of the
+    directory never see a half-written file.
+    """
+
+    def __init__(self, path, schema=None, batch_size=1000, mode='a',
+                 compression='zstd', dictionary_columns=DICTIONARY_COLUMNS):
+        _load_pyarrow("for Parquet output")
+        super().__init__(path, batch_size, mode)
+        self.checkpoint_records = batch_size
+        self.schema = schema
+        self.compression = compression
+        self.dictionary_columns = dictionary_columns
+        self.writer = None
+
+        os.makedirs(path, exist_ok=True)
+        for tmp_path in glob.glob(os.path.join(path, '*.tmp')):
+            os.remove(tmp_path)
+        parts = self._parts()
+        if mode == 'w':
+            for part in parts:
+                os.remove(part)
+            parts = []
+        elif parts and self.schema is None:
+            # Appended parts must match the existing ones
+            self.schema = pq.read_schema(parts[0])
+        self.part_count = len(parts)
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+
+    def _part_path(self, index):
+        return os.path.join(self.path, f'part-{index:05d}.parquet')
+
+    def _infer_schema(self, rows):
+        """Column types from the first batch; all-None columns become strings"""
+        fields = []
+        for column in rows[0]:
+            value = next((row[column] for row in rows if row.get(column) is not None), None)
+            if isinstance(value, bool):
+                value_type = pa.bool_()
+            elif isinstance(value, int):
+                value_type = pa.int64()
+            elif isinstance(value, float):
+                value_type = pa.float64()
+            else:
+                value_type = pa.string()
+            if column in self.dictionary_columns and value_type == pa.string():
+                value_type = pa.dictionary(pa.int32(), pa.string())
+            fields.append(pa.field(column, value_type))
+        return pa.schema(fields)
+
+    def _write_batch(self, rows):
+        if self.schema is None:
+            self.schema = self._infer_schema(rows)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(
+                self._part_path(self.part_count) + '.tmp', self.schema,
+                compression=self.compression,
+                use_dictionary=[column for column in self.dictionary_columns
+                                if column in self.schema.names])
+        self.writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+
+    def _finish_part(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            tmp_path = self._part_path(self.part_count) + '.tmp'
+            with open(tmp_path, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._part_path(self.part_count))
+            self.part_count += 1
+
+    def _sync(self):
+        self._finish_part()
+        return self.part_count
+
+    def _truncate(self, marker):
+        for part in self._parts()[marker:]:
+            os.remove(part)
+        self.part_count = marker
+
+    def _close(self):
+        self._finish_part()
+
+
+def resume_sinks(sinks):
+    """
+    Roll sinks that get the same records back to their latest common
+    checkpoint and return its position (None if there is nothing to
+    resume). Raises ValueError when they have no checkpoint in common, as
+    resuming any one of them would duplicate or lose records in the others.
+    """
+    options = [sink.checkpoints() for sink in sinks]
+    if not any(options):
+        return None
+    for checkpoint in options[0]:
+        matches = [next((other for other in choices if other['position'] == checkpoint['position']),
+                        None) for choices in options]
+        if all(matches):
+            for sink, match in zip(sinks, matches):
+                sink.resume(match)
+            return checkpoint['position']
+    raise ValueError("cannot resume: the checkpoints of "
+                     + ', '.join(sink.path for sink in sinks) + " do not match; start over")
+
+
+def read_columns(path, columns=None, filters=None):
+    """
+    Load a Parquet file or dataset directory as a DataFrame, reading only
+    the given columns (e.g. ['url', 'word_count']) and, optionally, only
+    rows matching pyarrow filters such as [('domain', '==', 'example.com')]
+    """
+    _load_pyarrow("to read Parquet output")
+    return pq.read_table(path, columns=columns, filters=filters).to_pandas()
+
+
+def make_sink(path, batch_size=100, mode='a', **kwargs):
+    """Pick a sink from the output file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return CsvSink(path, batch_size=batch_size, mode=mode, **kwargs)
+    if extension in ('.jsonl', '.ndjson'):
+        return JsonLinesSink(path, batch_size=batch_size, mode=mode)
+    if extension in ('.db', '.sqlite', '.sqlite3'):
+        return SQLiteSink(path, batch_size=batch_size, mode=mode, **kwargs)
+    if extension == '.parquet':
+        # Row groups should be much larger than a CSV write batch
+        return ParquetSink(path, batch_size=max(batch_size, 1000), mode=mode, **kwargs)
+    raise ValueError(f"Don't know how to write {path!r} (use .csv, .jsonl, .sqlite or .parquet)")
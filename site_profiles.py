@@ -0,0 +1,57 @@
+"""
+Learned selectors per site, persisted between runs.
+
+The first listing page of a site goes through the full selector search:
+every container selector, the ordered field selectors and the next-page
+selectors. The ones that won are stored as the site's profile, and later
+pages (and later runs) try only those. The scraper goes back to the full
+search when the profile stops matching, e.g. after a redesign, and stores
+what wins then.
+
+A profile looks like
+    {"containers": [".post"],
+     "fields": {"title": ".entry-title", "url": "h2 a", "date": "time"},
+     "next": "a.next",
+     "updated": "2025-04-04"}
+"""
+import json
+import os
+from datetime import datetime
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+class SiteProfiles:
+    """Winning selectors per domain, stored as JSON"""
+
+    def __init__(self, path="site_profiles.json"):
+        self.path = path
+        self.profiles = {}
+        self.changed = False
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.profiles = json.load(f)
+
+    def get(self, site):
+        """The profile of site, or None before it was learned"""
+        return self.profiles.get(site)
+
+    def update(self, site, **selectors):
+        """Store winning selectors for site (containers, fields, next)"""
+        profile = self.profiles.setdefault(site, {})
+        changed = {key: value for key, value in selectors.items() if profile.get(key) != value}
+        if changed:
+            profile.update(changed)
+            profile['updated'] = datetime.now().strftime(DATE_FORMAT)
+            self.changed = True
+
+    def save(self):
+        """Write the profiles atomically, if anything was learned"""
+        if not self.changed:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.profiles, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.changed = False
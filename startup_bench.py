@@ -0,0 +1,95 @@
+"""
+Startup cost of the scrapers' entry points, measured with -X importtime.
+
+Every module is imported in a fresh interpreter several times. The report
+shows the median cumulative import time, the wall time of the process and
+the heavy dependencies the import pulled in. The run fails when a module
+goes over its time budget or loads a dependency it should only load on
+first use, so a stray top-level import of pandas is caught before it slows
+down thousands of short scraping jobs.
+
+Run with: python startup_bench.py [--runs N] [--scale F] [module ...]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Dependencies that take 100 ms or more to import
+HEAVY = ('pandas', 'numpy', 'pyarrow', 'aiohttp', 'bs4', 'lxml', 'soupsieve')
+
+# Entry point: (import budget in ms, heavy dependencies it must not load)
+BUDGETS = {
+    'htmlfile_scrap': (450, HEAVY),
+    'distributed': (450, HEAVY),
+    'http_gateway': (500, ('pandas', 'numpy', 'pyarrow', 'aiohttp')),
+    'main': (25, HEAVY + ('requests',)),
+}
+
+# "import time: self [us] | cumulative | [indent]package"
+IMPORTTIME_RE = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+def measure(module, python=sys.executable):
+    """(cumulative import ms, process wall ms, top-level packages loaded) of one import"""
+    started = time.perf_counter()
+    result = subprocess.run([python, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True, check=False)
+    wall = (time.perf_counter() - started) * 1000
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    cumulative = None
+    packages = set()
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        name = match.group(3)
+        packages.add(name.split('.')[0])
+        if name == module and not match.group(2):
+            cumulative = int(match.group(1)) / 1000
+    return cumulative, wall, packages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the import time of the entry points")
+    parser.add_argument('modules', nargs='*', help="entry points to check (default: all)")
+    parser.add_argument('--runs', type=int, default=5, help="imports per module (median is used)")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="multiply the time budgets (for slow machines)")
+    args = parser.parse_args(argv)
+
+    baseline = statistics.median(measure('sys')[1] for _ in range(args.runs))
+    print(f"Interpreter startup: {baseline:.0f} ms\n")
+    print(f"{'module':<16}{'import ms':>10}{'budget':>8}{'wall ms':>9}  heavy dependencies")
+
+    ok = True
+    for module in args.modules or BUDGETS:
+        budget, forbidden = BUDGETS.get(module, (float('inf'), ()))
+        budget *= args.scale
+        runs = [measure(module) for _ in range(args.runs)]
+        import_ms = statistics.median(run[0] for run in runs)
+        wall_ms = statistics.median(run[1] for run in runs)
+        loaded = sorted(set(HEAVY + ('requests',)) & runs[-1][2])
+        eager = sorted(set(forbidden) & runs[-1][2])
+
+        status = 'ok'
+        if import_ms > budget or eager:
+            status = 'OVER'
+            ok = False
+        print(f"{module:<16}{import_ms:>10.0f}{budget:>8.0f}{wall_ms:>9.0f}  "
+              f"{', '.join(loaded) or '-'}  {status}")
+        if eager:
+            print(f"  should load lazily: {', '.join(eager)}")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
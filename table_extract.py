@@ -0,0 +1,456 @@
+"""
+Streaming extraction of a single HTML table.
+
+pd.read_html parses every table on a page into a DataFrame and the caller
+throws all but one away. read_table feeds the page to an event parser chunk
+by chunk while it downloads, only collects cells inside the wanted table and
+stops reading as soon as that table ends. Row and column spans are expanded
+the way pandas does, and columns holding numbers, currency amounts or
+percentages come back as numeric dtypes.
+"""
+import codecs
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+
+import pandas as pd
+import requests
+from pandas.io.parsers import TextParser
+
+from htmlfile_scrap import HEADERS, SESSION
+from parsers import META_CHARSET_RE, declared_encoding, soup_backend
+
+try:
+    from lxml import etree
+except ImportError:  # optional dependency, html.parser is used without it
+    etree = None
+
+CHUNK_SIZE = 64 * 1024
+
+# Elements without an end tag, and elements whose text is never cell content
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'param', 'source', 'track', 'wbr',
+])
+SKIPPED_TAGS = frozenset(['script', 'style', 'template'])
+SECTION_TAGS = frozenset(['thead', 'tbody', 'tfoot'])
+
+# Browsers clamp spans to these values as well
+MAX_COLSPAN = 1000
+MAX_ROWSPAN = 65534
+
+SELECTOR_RE = re.compile(r'#([\w-]+)|\.([\w-]+)|\[([\w-]+)(?:=["\']?([^"\'\]]*)["\']?)?\]')
+
+# Pieces of a cell that are not part of the number: footnote markers,
+# currency symbols and codes, thousands separators, percent signs, spaces
+NUMBER_NOISE_RE = re.compile(r'\[[^\]]*\]|[$€£¥₹,%\s]|\b(?:US|USD|EUR|GBP|INR|Rs\.?)(?=[\d$])')
+NUMBER_RE = re.compile(r'-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+# Cell values (after cleaning) that mean "no value" in a numeric column
+MISSING_VALUES = frozenset(['', '-', '\u2012', '\u2013', '\u2014', 'n/a', 'na'])
+
+# Outcome of one URL in read_tables; error is None when table was extracted
+TableResult = namedtuple('TableResult', ['url', 'table', 'error'])
+
+
+def parse_selector(selector):
+    """
+    Split a simple CSS selector such as 'table.wikitable#films' or
+    '[data-name=gross]' into (id, classes, attributes). Combinators and
+    pseudo-classes are not supported, since the match has to be decided
+    from the opening tag alone.
+    """
+    if not selector:
+        return None, (), {}
+    rest = selector.strip()
+    if rest.startswith('table'):
+        rest = rest[len('table'):]
+    element_id, classes, attributes = None, [], {}
+    position = 0
+    for match in SELECTOR_RE.finditer(rest):
+        if match.start() != position:
+            break
+        position = match.end()
+        if match.group(1):
+            element_id = match.group(1)
+        elif match.group(2):
+            classes.append(match.group(2))
+        else:
+            attributes[match.group(3)] = match.group(4)
+    if position != len(rest):
+        raise ValueError(f"Unsupported table selector: {selector!r}")
+    return element_id, tuple(classes), attributes
+
+
+def is_hidden(attrs):
+    """Whether an element is hidden with an inline display:none (pandas drops those)"""
+    return 'display:none' in (attrs.get('style') or '').replace(' ', '')
+
+
+def _span(value, limit):
+    try:
+        return min(max(int(value), 1), limit)
+    except (TypeError, ValueError):
+        return 1
+
+
+class TableCollector:
+    """
+    Parser target that keeps the cells of one table and ignores everything
+    else. Works with lxml's target parser interface (start/end/data/close)
+    and is driven by html.parser through _StdlibDriver.
+    """
+
+    def __init__(self, index=0, selector=None, match=None):
+        self.index = index
+        self.element_id, self.classes, self.attributes = parse_selector(selector)
+        self.match = re.compile(match) if isinstance(match, str) else match
+
+        self.seen = 0        # Candidate tables passed over so far
+        self.depth = 0       # Open tables inside the captured one (0 = not capturing)
+        self.rows = None     # (section, cells) of the captured table
+        self.section = None
+        self.row = None
+        self.cell = None     # [text parts, rowspan, colspan, is_th]
+        self.skip_tag = None
+        self.skip_level = 0
+        self.done = False
+
+    def _is_candidate(self, attrs):
+        if is_hidden(attrs):
+            return False
+        if self.element_id is not None and attrs.get('id') != self.element_id:
+            return False
+        if self.classes:
+            classes = (attrs.get('class') or '').split()
+            if not all(name in classes for name in self.classes):
+                return False
+        for name, value in self.attributes.items():
+            if name not in attrs or (value is not None and attrs[name] != value):
+                return False
+        return True
+
+    def _close_cell(self):
+        if self.cell is not None:
+            if self.row is None:
+                self.row = []
+            self.row.append(self.cell)
+            self.cell = None
+
+    def _close_row(self):
+        self._close_cell()
+        if self.row is not None:
+            self.rows.append((self.section, self.row))
+            self.row = None
+
+    def start(self, tag, attrs):
+        if self.done:
+            return
+        if self.skip_tag is not None:
+            if tag == self.skip_tag:
+                self.skip_level += 1
+            return
+        if not self.depth:
+            if tag == 'table' and self._is_candidate(attrs):
+                if self.match is None and self.seen < self.index:
+                    self.seen += 1
+                else:
+                    self.depth = 1
+                    self.rows = []
+            return
+
+        if tag in SKIPPED_TAGS or (tag not in VOID_TAGS and is_hidden(attrs)):
+            self.skip_tag, self.skip_level = tag, 1
+            return
+        if tag == 'br':
+            self.data('\n')
+        elif tag == 'table':
+            self.depth += 1
+        elif self.depth == 1:
+            # Nested tables are plain cell content; only the outer table's
+            # structure counts. Missing end tags are implied, as in HTML.
+            if tag in ('td', 'th'):
+                self._close_cell()
+                self.cell = [[], _span(attrs.get('rowspan'), MAX_ROWSPAN),
+                             _span(attrs.get('colspan'), MAX_COLSPAN), tag == 'th']
+            elif tag == 'tr':
+                self._close_row()
+            elif tag in SECTION_TAGS:
+                self._close_row()
+                self.section = tag
+
+    def end(self, tag):
+        if self.done or not self.depth:
+            return
+        if self.skip_tag is not None:
+            if tag == self.skip_tag:
+                self.skip_level -= 1
+                if not self.skip_level:
+                    self.skip_tag = None
+            return
+        if tag == 'table':
+            self.depth -= 1
+            if not self.depth:
+                self._close_row()
+                self._finish_table()
+        elif self.depth == 1:
+            if tag in ('td', 'th'):
+                self._close_cell()
+            elif tag == 'tr':
+                self._close_row()
+            elif tag in SECTION_TAGS:
+                self._close_row()
+                self.section = None
+
+    def data(self, text):
+        if self.cell is not None and self.skip_tag is None and not self.done:
+            self.cell[0].append(text)
+
+    def close(self):
+        return self.rows if self.done else None
+
+    def _finish_table(self):
+        rows, self.rows = self.rows, None
+        if self.match is not None:
+            text = ' '.join(''.join(cell[0]) for _, row in rows for cell in row)
+            if not self.match.search(text):
+                return
+            if self.seen < self.index:
+                self.seen += 1
+                return
+        self.rows = rows
+        self.done = True
+
+
+class _StdlibDriver(HTMLParser):
+    """Feeds html.parser events to a TableCollector"""
+
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, dict(attrs))
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+
+def make_parser(collector, backend=None):
+    """Incremental parser (anything with feed()) delivering events to collector"""
+    if soup_backend(backend) == 'lxml' and etree is not None:
+        return etree.HTMLParser(target=collector)
+    return _StdlibDriver(collector)
+
+
+def expand_spans(rows, remainder=None, overflow=True):
+    """
+    Turn rows of cells into rows of text, copying cells with a rowspan or
+    colspan into every position they cover (same rules as pd.read_html).
+    Returns (text rows, cells still spanning into the next section).
+    """
+    texts_by_row = []
+    remainder = list(remainder or ())
+    for cells in rows:
+        texts, next_remainder = [], []
+        index = 0
+        for parts, rowspan, colspan, _ in cells:
+            # Cells spanning down from earlier rows that sit before this one
+            while remainder and remainder[0][0] <= index:
+                prev_index, prev_text, prev_rowspan = remainder.pop(0)
+                texts.append(prev_text)
+                if prev_rowspan > 1:
+                    next_remainder.append((prev_index, prev_text, prev_rowspan - 1))
+                index += 1
+            text = ' '.join(''.join(parts).split())
+            for _ in range(colspan):
+                texts.append(text)
+                if rowspan > 1:
+                    next_remainder.append((index, text, rowspan - 1))
+                index += 1
+        for prev_index, prev_text, prev_rowspan in remainder:
+            texts.append(prev_text)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_index, prev_text, prev_rowspan - 1))
+        texts_by_row.append(texts)
+        remainder = next_remainder
+
+    if not overflow:
+        # Rows that only exist because of a rowspan reaching past the last row
+        while remainder:
+            texts, next_remainder = [], []
+            for prev_index, prev_text, prev_rowspan in remainder:
+                texts.append(prev_text)
+                if prev_rowspan > 1:
+                    next_remainder.append((prev_index, prev_text, prev_rowspan - 1))
+            texts_by_row.append(texts)
+            remainder = next_remainder
+    return texts_by_row, remainder
+
+
+def rows_to_frame(rows):
+    """Build a DataFrame from collected (section, cells) rows the way
+    pd.read_html does: <thead> rows, or leading all-<th> rows, are the header"""
+    head = [cells for section, cells in rows if section == 'thead']
+    body = [cells for section, cells in rows if section not in ('thead', 'tfoot')]
+    foot = [cells for section, cells in rows if section == 'tfoot']
+    if not head:
+        while body and all(is_th for *_, is_th in body[0]):
+            head.append(body.pop(0))
+
+    head, remainder = expand_spans(head)
+    body, remainder = expand_spans(body, remainder, overflow=bool(foot))
+    foot, _ = expand_spans(foot, remainder, overflow=False)
+
+    header = None
+    if head:
+        if len(head) == 1:
+            header = 0
+        else:
+            header = [i for i, row in enumerate(head) if any(row)]
+    data = head + body + foot
+    width = max((len(row) for row in data), default=0)
+    for row in data:
+        row.extend([''] * (width - len(row)))
+
+    with TextParser(data, header=header, thousands=',') as parser:
+        return parser.read()
+
+
+def parse_numeric_columns(frame):
+    """
+    Convert text columns that hold numbers once footnote markers, currency
+    symbols, thousands separators and percent signs are removed (e.g.
+    '$2,923,706,026[1]' -> 2923706026, '12.5%' -> 12.5). A column is only
+    converted when every non-missing cell parses; dashes and 'n/a' count as
+    missing. The first value of a column decides whether the column-wide
+    conversion is attempted at all, so text columns cost next to nothing.
+    """
+    for column in frame.select_dtypes(include=['object', 'string']).columns:
+        text = frame[column]
+        first = text.first_valid_index()
+        if first is None or not looks_numeric(str(text[first])):
+            continue
+        cleaned = (text.astype('string').str.replace(NUMBER_NOISE_RE.pattern, '', regex=True)
+                       .str.replace('\u2212', '-', regex=False))
+        numbers = pd.to_numeric(cleaned.astype(object), errors='coerce')
+        unparsed = numbers.isna() & text.notna() & ~cleaned.str.lower().isin(MISSING_VALUES)
+        if not unparsed.any():
+            frame[column] = numbers
+    return frame
+
+
+def looks_numeric(value):
+    """Whether a cell value is a number once the noise around it is removed"""
+    cleaned = NUMBER_NOISE_RE.sub('', value).replace('\u2212', '-')
+    return NUMBER_RE.fullmatch(cleaned) is not None
+
+
+def _decode(chunks, encoding=None):
+    """Decode byte chunks incrementally; without a declared encoding the
+    first chunk is sniffed for <meta charset>, falling back to UTF-8"""
+    decoder = None
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            yield chunk
+            continue
+        if decoder is None:
+            if encoding is None:
+                declared = META_CHARSET_RE.search(chunk[:4096])
+                encoding = declared.group(1).decode('ascii') if declared else 'utf-8'
+            try:
+                decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+            except LookupError:
+                decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        yield decoder.decode(chunk)
+    if decoder is not None:
+        yield decoder.decode(b'', final=True)
+
+
+def _read_chunks(file):
+    while True:
+        chunk = file.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_source(source, session=None, cache=None, timeout=30):
+    """
+    Yield the markup of source as text chunks. source may be a URL, an HTML
+    string, bytes, a file-like object or a path. URLs are streamed, so the
+    caller can stop reading early; through a cache the body is downloaded in
+    full (it has to be stored) but is still parsed only as far as needed.
+    """
+    if isinstance(source, bytes):
+        yield from _decode([source])
+    elif hasattr(source, 'read'):
+        yield from _decode(_read_chunks(source))
+    elif isinstance(source, str) and source.startswith(('http://', 'https://')):
+        session = session or SESSION
+        if cache is not None:
+            response = cache.get(session, source, headers=HEADERS, timeout=timeout)
+            response.raise_for_status()
+            body = response.content
+            chunks = (body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE))
+            yield from _decode(chunks, declared_encoding(response))
+            return
+        with session.get(source, headers=HEADERS, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            yield from _decode(response.iter_content(CHUNK_SIZE), declared_encoding(response))
+    elif isinstance(source, str) and '<' in source:
+        for i in range(0, len(source), CHUNK_SIZE):
+            yield source[i:i + CHUNK_SIZE]
+    else:
+        with open(os.fspath(source), 'rb') as f:
+            yield from _decode(_read_chunks(f))
+
+
+def read_table(source, index=0, selector=None, match=None, typed=True, backend=None,
+               session=None, cache=None, timeout=30):
+    """
+    Return one table of an HTML page as a DataFrame.
+
+    The table is the index-th one (counting from 0) among the tables that
+    match selector (e.g. 'table.wikitable') and whose text matches the
+    regex match. Reading stops once that table is complete. With typed,
+    number-like text columns are converted by parse_numeric_columns.
+    """
+    collector = TableCollector(index, selector, match)
+    parser = make_parser(collector, backend)
+    chunks = iter_source(source, session, cache, timeout)
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            if collector.done:
+                break
+    finally:
+        chunks.close()  # Drops the connection of a half-read response
+
+    if not collector.done:
+        raise ValueError(f"No table #{index} matching selector={selector!r}, match={match!r} found")
+    frame = rows_to_frame(collector.rows)
+    return parse_numeric_columns(frame) if typed else frame
+
+
+def read_tables(urls, index=0, selector=None, match=None, typed=True, backend=None,
+                cache=None, workers=8, timeout=30):
+    """
+    Extract the same table from many pages with a pool of threads sharing
+    the keep-alive session (and the HTTP cache, if given). Yields a
+    TableResult per URL, in input order.
+    """
+    def extract(url):
+        try:
+            table = read_table(url, index, selector, match, typed, backend,
+                               cache=cache, timeout=timeout)
+            return TableResult(url, table, None)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            return TableResult(url, None, str(e))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(extract, urls)